@@ -1,2 +1,5 @@
-from .statistics import Trace, Statistic, Intervals
-from .simulator import simulate, Logger, Simulator, Kernel, Model
+from .statistics import Trace, Statistic, Intervals, TimeAverage, \
+    Histogram, P2Quantile, TDigest, StatisticsRegistry
+from .simulator import simulate, Logger, Simulator, Kernel, Model, \
+    Precision, Replications
+from .distributed import Coordinator
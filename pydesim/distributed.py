@@ -0,0 +1,279 @@
+"""Distributed execution of simulations over TCP.
+
+The process calling `simulate()` runs a coordinator, which holds the tasks
+(sweep points or replications) and serves them to remote workers:
+
+    with Coordinator(('0.0.0.0', 5000), authkey=b'secret') as coordinator:
+        results = simulate(Model, params=points, extract=fn,
+                           coordinator=coordinator)
+
+Workers are started on any hosts able to import the model code:
+
+    python -m pydesim.worker --connect host:5000 --authkey secret
+
+Workers pull tasks one by one and send each result back as soon as it is
+ready. When no pending tasks are left, an idle worker duplicates the oldest
+task still running on another worker (the first result wins), so slow nodes
+do not delay the end of the sweep. Workers send heartbeats, and tasks of the
+workers that stopped sending them are put back to the queue.
+
+Tasks and results are pickled, so only run workers with a coordinator you
+trust, and always use a secret `authkey`.
+"""
+import collections
+import itertools
+import pickle
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing.managers import BaseManager
+
+import numpy as np
+
+from .simulator import _replicate
+
+
+class _TaskBoard:
+    def __init__(self, heartbeat_timeout=10.0, max_copies=2,
+                 clock=time.monotonic):
+        self.__heartbeat_timeout = heartbeat_timeout
+        self.__max_copies = max_copies
+        self.__clock = clock
+        self.__cond = threading.Condition()
+        self.__next_id = itertools.count()
+        self.__pending = collections.deque()
+        self.__payloads = {}
+        self.__running = {}  # task id -> {worker id: start time}
+        self.__results = {}  # task id -> (ok, payload)
+        self.__workers = {}  # worker id -> last heartbeat time
+        self.__closed = False
+
+    def register(self):
+        worker_id = uuid.uuid4().hex
+        self.heartbeat(worker_id)
+        return worker_id
+
+    def heartbeat(self, worker_id):
+        with self.__cond:
+            self.__workers[worker_id] = self.__clock()
+
+    def num_workers(self):
+        with self.__cond:
+            self._requeue_lost()
+            return len(self.__workers)
+
+    def closed(self):
+        return self.__closed
+
+    def close(self):
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+    def submit(self, payloads):
+        with self.__cond:
+            task_ids = []
+            for payload in payloads:
+                task_id = next(self.__next_id)
+                self.__payloads[task_id] = payload
+                self.__pending.append(task_id)
+                task_ids.append(task_id)
+            return task_ids
+
+    def get_task(self, worker_id):
+        with self.__cond:
+            now = self.__clock()
+            self.__workers[worker_id] = now
+            self._requeue_lost()
+            if self.__closed:
+                return None
+            if self.__pending:
+                task_id = self.__pending.popleft()
+            else:
+                candidates = [
+                    (min(starts.values()), task_id)
+                    for task_id, starts in self.__running.items()
+                    if worker_id not in starts and
+                    len(starts) < self.__max_copies]
+                if not candidates:
+                    return None
+                task_id = min(candidates)[1]
+            self.__running.setdefault(task_id, {})[worker_id] = now
+            return task_id, self.__payloads[task_id]
+
+    def put_result(self, worker_id, task_id, ok, payload):
+        with self.__cond:
+            self.__workers[worker_id] = self.__clock()
+            if task_id not in self.__payloads:
+                return  # the result was already received from another worker
+            self.__running.pop(task_id, None)
+            del self.__payloads[task_id]
+            self.__results[task_id] = (ok, payload)
+            self.__cond.notify_all()
+
+    def wait(self, task_ids, timeout=None):
+        """Wait for some of the given tasks and pop their results."""
+        with self.__cond:
+            self._requeue_lost()
+            ready = [tid for tid in task_ids if tid in self.__results]
+            if not ready:
+                self.__cond.wait(timeout)
+                ready = [tid for tid in task_ids if tid in self.__results]
+            return {tid: self.__results.pop(tid) for tid in ready}
+
+    def _requeue_lost(self):
+        now = self.__clock()
+        lost = {worker_id for worker_id, seen in self.__workers.items()
+                if now - seen > self.__heartbeat_timeout}
+        if not lost:
+            return
+        for worker_id in lost:
+            del self.__workers[worker_id]
+        for task_id, starts in list(self.__running.items()):
+            for worker_id in lost & starts.keys():
+                del starts[worker_id]
+            if not starts:
+                del self.__running[task_id]
+                self.__pending.appendleft(task_id)
+
+
+_board = None
+
+
+def _init_board(heartbeat_timeout):
+    global _board
+    _board = _TaskBoard(heartbeat_timeout)
+
+
+def _get_board():
+    return _board
+
+
+class _BoardManager(BaseManager):
+    pass
+
+
+_BoardManager.register('board', callable=_get_board)
+
+
+class Coordinator:
+    """Serves simulation tasks to workers started with `pydesim.worker`.
+
+    Pass the coordinator to `simulate(..., coordinator=coordinator)` in place
+    of `processes`. The server process is started on the first use, or when
+    entering the `with` block, and is stopped with `close()`.
+    """
+    def __init__(self, address=('127.0.0.1', 0), authkey=None,
+                 heartbeat_timeout=10.0):
+        if not authkey:
+            raise ValueError('authkey required')
+        self.__heartbeat_timeout = heartbeat_timeout
+        self.__manager = _BoardManager(address=address, authkey=authkey)
+        self.__board = None
+        self.__seeds = np.random.SeedSequence()
+
+    @property
+    def address(self):
+        return self.__manager.address
+
+    @property
+    def processes(self):
+        self.start()
+        return max(1, self.__board.num_workers())
+
+    def start(self):
+        if self.__board is None:
+            self.__manager.start(_init_board, (self.__heartbeat_timeout,))
+            self.__board = self.__manager.board()
+
+    def close(self):
+        if self.__board is not None:
+            self.__board.close()
+            # Give the workers a chance to see the board closed:
+            time.sleep(0.2)
+            self.__board = None
+            self.__manager.shutdown()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def stream(self, extract, args_list, seeds=None):
+        """Run tasks on workers, yield `(index, result)` as results arrive.
+        """
+        self.start()
+        if seeds is None:
+            seeds = [int(seq.generate_state(1)[0])
+                     for seq in self.__seeds.spawn(len(args_list))]
+        task_ids = self.__board.submit([
+            pickle.dumps((seed, extract, args))
+            for seed, args in zip(seeds, args_list)])
+        indices = {task_id: i for i, task_id in enumerate(task_ids)}
+        while indices:
+            ready = self.__board.wait(list(indices), timeout=1.0)
+            for task_id, (ok, payload) in ready.items():
+                if not ok:
+                    raise RuntimeError(f'simulation failed on worker:\n'
+                                       f'{payload}')
+                yield indices.pop(task_id), pickle.loads(payload)
+
+    def run(self, extract, args_list, seeds=None):
+        results = [None] * len(args_list)
+        for index, result in self.stream(extract, args_list, seeds):
+            results[index] = result
+        return results
+
+
+def _connect(address, authkey, timeout):
+    deadline = time.monotonic() + timeout
+    while True:
+        client = _BoardManager(address=address, authkey=authkey)
+        try:
+            client.connect()
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+        else:
+            return client.board()
+
+
+def _send_heartbeats(address, authkey, worker_id, interval, stop):
+    try:
+        board = _connect(address, authkey, timeout=interval)
+        while not stop.wait(interval):
+            board.heartbeat(worker_id)
+    except (EOFError, OSError):
+        pass  # the coordinator is gone
+
+
+def run_worker(address, authkey, heartbeat=1.0, poll=0.1,
+               connect_timeout=30.0):
+    """Connect to a coordinator and run its tasks until it is closed."""
+    board = _connect(address, authkey, connect_timeout)
+    worker_id = board.register()
+    stop = threading.Event()
+    threading.Thread(target=_send_heartbeats, daemon=True, args=(
+        address, authkey, worker_id, heartbeat, stop)).start()
+    try:
+        while True:
+            task = board.get_task(worker_id)
+            if task is None:
+                if board.closed():
+                    break
+                time.sleep(poll)
+                continue
+            task_id, payload = task
+            try:
+                result = True, pickle.dumps(_replicate(pickle.loads(payload)))
+            except Exception:
+                result = False, traceback.format_exc()
+            board.put_result(worker_id, task_id, *result)
+    except (EOFError, OSError):
+        pass  # the coordinator is gone
+    finally:
+        stop.set()
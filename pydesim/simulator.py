@@ -1,9 +1,21 @@
+import hashlib
 import heapq
 import itertools
+import multiprocessing
+import multiprocessing.reduction
+import os
+import pickle
+import random
 import re
+import zlib
 from enum import Enum
 from functools import total_ordering
 import colorama
+import numpy as np
+
+from .statistics import t_quantile, Statistic, Trace, Intervals, \
+    TimeAverage, Histogram, StatisticsRegistry, register_transfer, \
+    _reset_statistic
 
 
 def camel_to_snake_case(name):
@@ -89,8 +101,109 @@ class _Event:
                 self.__stime == other.stime and self.__id < other.id)
 
 
+def _stream_key(name):
+    if not name:
+        return ()
+    return tuple(zlib.crc32(part.encode()) for part in name.split('.'))
+
+
+def _find_statistics(data, registry=None):
+    """Find statistics in the registry and model data, walking `Model`
+    children recursively.
+    """
+    found = [] if registry is None else [stat for _, stat in registry.items()]
+    visited = {id(stat) for stat in found}
+    stack = [data]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in visited:
+            continue
+        visited.add(id(obj))
+        if isinstance(obj, (Statistic, Trace, Intervals, TimeAverage,
+                            Histogram)):
+            found.append(obj)
+        elif isinstance(obj, dict):
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple)):
+            stack.extend(obj)
+        elif obj is data or isinstance(obj, Model):
+            stack.extend(getattr(obj, '__dict__', {}).values())
+    return found
+
+
+class _Warmup:
+    """Resets model statistics when the warm-up period is over.
+
+    If `warmup` is a number, statistics are reset at exactly that time,
+    before the first event at or after it is handled. Otherwise it is a
+    detection method name (`'auto'` is the same as `'mser'`, or `'welch'`),
+    and statistics are checked after `check_every` events, then after twice
+    as many events, and so on. Steady state is detected when every statistic
+    with at least `min_samples` samples has its warm-up strictly within the
+    first half of the data.
+    """
+    def __init__(self, warmup, check_every=1000, min_samples=100):
+        if isinstance(warmup, str):
+            if warmup not in {'auto', 'mser', 'welch'}:
+                raise ValueError('invalid warmup method')
+            self.__method = 'mser' if warmup == 'auto' else warmup
+            self.__time_limit = None
+        else:
+            self.__method = None
+            self.__time_limit = warmup
+        self.__next_check = check_every
+        self.__min_samples = min_samples
+        self.__time = None
+
+    @property
+    def time(self):
+        return self.__time
+
+    @property
+    def done(self):
+        return self.__time is not None
+
+    def before_event(self, sim):
+        if self.__time_limit is not None and sim.stime >= self.__time_limit:
+            self._reset(sim, self.__time_limit)
+
+    def after_event(self, sim):
+        if self.__method is not None and sim.num_events >= self.__next_check:
+            self.__next_check *= 2
+            if self._detected(sim):
+                self._reset(sim, sim.stime)
+
+    def _detected(self, sim):
+        num_checked = 0
+        for stat in _find_statistics(sim.data, sim.stats):
+            if not isinstance(stat, (Statistic, Trace)) or \
+                    len(stat) < self.__min_samples:
+                continue
+            try:
+                point = stat.warmup(self.__method)
+            except ValueError:
+                continue
+            if isinstance(stat, Trace):
+                start, end = stat.asarray('split')[0][[0, -1]]
+                if point - start >= (end - start) / 2:
+                    return False
+            elif point >= len(stat) / 2:
+                return False
+            num_checked += 1
+        return num_checked > 0
+
+    def _reset(self, sim, t):
+        for stat in _find_statistics(sim.data, sim.stats):
+            _reset_statistic(stat, t)
+        self.__time = t
+        sim.logger.debug('warm-up finished', src='kernel')
+
+
 class Kernel:
-    def __init__(self):
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.__seed = seed
         self.__queue = []
         self.__stime = 0
         self.__evids = {}
@@ -98,11 +211,20 @@ class Kernel:
         self.__num_events = 0
         self.__queue_size = 0
         self.__stop_predicates = []
+        self.__warmup = None
 
     @property
     def stime(self):
         return self.__stime
 
+    @property
+    def warmup_time(self):
+        return self.__warmup.time if self.__warmup is not None else None
+
+    @property
+    def seed(self):
+        return self.__seed
+
     @property
     def empty(self):
         return self.__queue_size == 0
@@ -150,11 +272,13 @@ class Kernel:
     def _test_stop(self):
         return any(pred(self) for pred in self.__stop_predicates)
 
-    def setup(self, stime_limit=None):
+    def setup(self, stime_limit=None, warmup=None):
         if stime_limit is not None and stime_limit > 0:
             self.__stop_predicates.append(
                 lambda kern: stime_limit < kern.stime
             )
+        if warmup is not None:
+            self.__warmup = _Warmup(warmup)
 
     def run(self, sim, init, fin):
         if hasattr(sim.data, 'initialize'):
@@ -165,6 +289,8 @@ class Kernel:
         while not self.empty:
             event = self._next_event()
             if not self._test_stop():
+                if self.__warmup is not None and not self.__warmup.done:
+                    self.__warmup.before_event(sim)
                 if event.fn:
                     if hasattr(event.fn, '__self__'):
                         sim.logger.trace(
@@ -179,6 +305,8 @@ class Kernel:
                         )
                         event.fn(sim, *event.args, **event.kwargs)
                     self.__num_events += 1
+                    if self.__warmup is not None and not self.__warmup.done:
+                        self.__warmup.after_event(sim)
             else:
                 break
 
@@ -255,6 +383,8 @@ class Simulator:
         self.__logger = Logger(kernel)
         if loglevel is not None:
             self.__logger.level = loglevel
+        self.__streams = {}
+        self.__stats = StatisticsRegistry()
         # Creating model data:
         if isinstance(protodata, type):
             # If protodata is a class, then we create an instance of it with
@@ -283,6 +413,30 @@ class Simulator:
     def num_events(self):
         return self.__kernel.num_events
 
+    @property
+    def warmup_time(self):
+        return self.__kernel.warmup_time
+
+    @property
+    def seed(self):
+        return self.__kernel.seed
+
+    def rng(self, name=''):
+        """Get a random generator for the named stream.
+
+        Streams are derived from the simulation seed and the stream name, so
+        runs with the same seed get the same variates in the streams with the
+        same names, whatever other streams are used. Dots in names separate
+        path components, e.g. `'source.arrivals'`.
+        """
+        try:
+            return self.__streams[name]
+        except KeyError:
+            seq = np.random.SeedSequence(self.seed, spawn_key=_stream_key(name))
+            generator = np.random.default_rng(seq)
+            self.__streams[name] = generator
+            return generator
+
     def schedule(self, delay, handler=None, args=(), kwargs=None):
         return self.__kernel.add_event(delay, handler, args, kwargs)
 
@@ -301,32 +455,355 @@ class Simulator:
     def handlers(self):
         return self.__handlers
 
+    @property
+    def stats(self):
+        return self.__stats
+
     @property
     def logger(self):
         return self.__logger
 
 
-def simulate(data, init=None, fin=None, handlers=None, params=None,
-             stime_limit=None, loglevel=Logger.Level.INFO):
-    stime_limit = stime_limit if stime_limit is not None else 0
+class Precision:
+    """Stopping rule for running replications until the estimate is precise.
+
+    Replications are launched in batches of `batch_size` (by default, one
+    per worker process) until the confidence interval half-width falls
+    below `abs_tol` or below `rel_tol` times the absolute mean value, or
+    until `max_replications` are done.
+    """
+    def __init__(self, abs_tol=None, rel_tol=None, confidence=0.95,
+                 batch_size=None, min_replications=5, max_replications=1000):
+        if abs_tol is None and rel_tol is None:
+            raise ValueError('absolute or relative tolerance expected')
+        if not 0 < confidence < 1:
+            raise ValueError('confidence must be in (0, 1)')
+        if min_replications < 2:
+            raise ValueError('at least two replications required')
+        if max_replications < min_replications:
+            raise ValueError('max_replications less than min_replications')
+        if batch_size is not None and batch_size < 1:
+            raise ValueError('positive batch size expected')
+        self.abs_tol, self.rel_tol = abs_tol, rel_tol
+        self.confidence = confidence
+        self.batch_size = batch_size
+        self.min_replications = min_replications
+        self.max_replications = max_replications
+
+    def satisfied(self, estimate):
+        if len(estimate) < self.min_replications:
+            return False
+        hw = estimate.half_width
+        if self.abs_tol is not None and hw <= self.abs_tol:
+            return True
+        return self.rel_tol is not None and hw <= self.rel_tol * abs(
+            estimate.mean)
+
+
+class Replications:
+    """Values extracted from independent replications and their mean CI."""
+    def __init__(self, values, confidence=0.95, converged=False):
+        self.__values = tuple(values)
+        self.__confidence = confidence
+        self.__converged = converged
+
+    @property
+    def values(self):
+        return self.__values
+
+    @property
+    def confidence(self):
+        return self.__confidence
+
+    @property
+    def converged(self):
+        return self.__converged
+
+    def __len__(self):
+        return len(self.__values)
+
+    @property
+    def mean(self):
+        if not self.__values:
+            raise ValueError('no data')
+        return float(np.mean(self.__values))
+
+    @property
+    def std(self):
+        if len(self.__values) < 2:
+            raise ValueError('at least two replications required')
+        return float(np.std(self.__values, ddof=1))
 
-    if isinstance(params, list):
-        results = []
-        for a_params in params:
-            kernel = Kernel()
-            sim = Simulator(kernel, data, handlers, a_params, loglevel)
-            kernel.setup(stime_limit=stime_limit)
-            kernel.run(sim, init=init, fin=fin)
-            results.append(sim)
+    @property
+    def half_width(self):
+        n = len(self.__values)
+        if n < 2:
+            return float('inf')
+        q = t_quantile((1 + self.__confidence) / 2, n - 1)
+        return q * self.std / n ** 0.5
+
+    def interval(self):
+        return self.mean - self.half_width, self.mean + self.half_width
+
+
+class _Executor:
+    """Runs simulations either in this process or in a pool of workers.
+
+    When running in a pool, each replication gets its own seed unless seeds
+    are given explicitly, since forked workers would otherwise share the
+    parent's random state. Large statistics in the
+    results are passed back through memory-mapped files, see
+    `register_transfer()`.
+    """
+    def __init__(self, processes=None):
+        self.__processes = processes if processes is not None else 1
+        self.__pool = None
+        self.__seeds = np.random.SeedSequence()
+
+    @property
+    def processes(self):
+        return self.__processes
+
+    def __enter__(self):
+        if self.__processes > 1:
+            self.__pool = multiprocessing.Pool(
+                self.__processes, initializer=_init_worker)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.__pool is not None:
+            if exc_type is None:
+                self.__pool.close()
+            else:
+                self.__pool.terminate()
+            self.__pool.join()
+            self.__pool = None
+
+    def stream(self, extract, args_list, seeds=None):
+        """Run simulations, yield `(index, result)` as results are ready."""
+        if seeds is None:
+            if self.__pool is None:
+                seeds = [None] * len(args_list)
+            else:
+                seeds = [int(seq.generate_state(1)[0])
+                         for seq in self.__seeds.spawn(len(args_list))]
+        tasks = [(seed, extract, args) for seed, args in zip(seeds, args_list)]
+        if self.__pool is None:
+            for index, task in enumerate(tasks):
+                yield index, _replicate(task)
+        else:
+            yield from self.__pool.imap_unordered(
+                _replicate_indexed, enumerate(tasks))
+
+    def run(self, extract, args_list, seeds=None):
+        results = [None] * len(args_list)
+        for index, result in self.stream(extract, args_list, seeds):
+            results[index] = result
         return results
 
-    kernel = Kernel()
+
+def _init_worker():
+    register_transfer(multiprocessing.reduction.ForkingPickler)
+
+
+def _run(data, init, fin, handlers, params, stime_limit, loglevel,
+         warmup=None, seed=None):
+    kernel = Kernel(seed)
     sim = Simulator(kernel, data, handlers, params, loglevel)
-    kernel.setup(stime_limit=stime_limit)
+    kernel.setup(stime_limit=stime_limit, warmup=warmup)
     kernel.run(sim, init=init, fin=fin)
     return sim
 
 
+def _replicate(task):
+    seed, extract, args = task
+    if seed is not None:
+        # Seed global generators as well for models not using `sim.rng()`:
+        global_seed = int(np.random.SeedSequence(seed).generate_state(1)[0])
+        random.seed(global_seed)
+        np.random.seed(global_seed)
+    sim = _run(*args, seed=seed)
+    return extract(sim) if extract is not None else sim
+
+
+def _replicate_indexed(item):
+    index, task = item
+    return index, _replicate(task)
+
+
+def _replicate_until(executor, precision, extract, args, seed=None):
+    batch_size = precision.batch_size or executor.processes
+    values = []
+    while True:
+        count = max(batch_size, precision.min_replications - len(values))
+        count = min(count, precision.max_replications - len(values))
+        seeds = None if seed is None else [
+            (seed, i) for i in range(len(values), len(values) + count)]
+        values.extend(executor.run(extract, [args] * count, seeds))
+        estimate = Replications(values, precision.confidence)
+        if precision.satisfied(estimate):
+            return Replications(values, precision.confidence, converged=True)
+        if len(values) >= precision.max_replications:
+            return estimate
+
+
+class _Journal:
+    """Append-only file with extracted results of completed sweep points.
+
+    Each record is a pickled `(key, result)` pair written as soon as the point
+    is done. Points which were running when the sweep crashed have no records
+    and are computed again. A record torn by a crash is dropped on opening.
+    """
+    def __init__(self, path):
+        self.__path = path
+        self.__results = {}
+        if os.path.exists(path):
+            offset = 0
+            with open(path, 'rb') as f:
+                while True:
+                    try:
+                        key, result = pickle.load(f)
+                    except (EOFError, pickle.UnpicklingError):
+                        break
+                    self.__results[key] = result
+                    offset = f.tell()
+            if os.path.getsize(path) > offset:
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+
+    def __contains__(self, key):
+        return key in self.__results
+
+    def __getitem__(self, key):
+        return self.__results[key]
+
+    def append(self, key, result):
+        self.__results[key] = result
+        with open(self.__path, 'ab') as f:
+            pickle.dump((key, result), f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def key(params, *settings):
+        """Hash a canonical encoding of sweep point `params` and `settings`.
+        Arrays are encoded with their dtype, shape and bytes, dicts with items
+        sorted by encoded keys. Values of other types raise `TypeError`.
+        """
+        digest = hashlib.sha256()
+        _Journal._encode((params,) + settings, digest.update)
+        return digest.hexdigest()
+
+    @staticmethod
+    def name(fn):
+        """Get the qualified name of callable `fn` (or None) for keys."""
+        if fn is None:
+            return None
+        qualname = getattr(fn, '__qualname__', type(fn).__qualname__)
+        return f'{getattr(fn, "__module__", None)}.{qualname}'
+
+    @staticmethod
+    def _encode(value, write):
+        if isinstance(value, np.generic):
+            value = np.asarray(value)
+        if value is None or isinstance(value, (bool, int, float, complex,
+                                               str)):
+            write(f'{type(value).__name__}:{value!r};'.encode())
+        elif isinstance(value, bytes):
+            write(f'bytes:{len(value)};'.encode() + value)
+        elif isinstance(value, np.ndarray):
+            if value.dtype.hasobject:
+                raise TypeError('object arrays can not be used as journal key')
+            write(f'ndarray:{value.dtype.str}:{value.shape};'.encode())
+            write(np.ascontiguousarray(value).tobytes())
+        elif isinstance(value, (tuple, list)):
+            write(f'{type(value).__name__}:{len(value)};'.encode())
+            for item in value:
+                _Journal._encode(item, write)
+        elif isinstance(value, dict):
+            items = []
+            for k, v in value.items():
+                encoded = []
+                _Journal._encode(k, encoded.append)
+                items.append((b''.join(encoded), v))
+            items.sort(key=lambda item: item[0])
+            write(f'dict:{len(items)};'.encode())
+            for k, v in items:
+                write(k)
+                _Journal._encode(v, write)
+        else:
+            raise TypeError(f'{type(value).__name__} values can not be used '
+                            f'as journal key')
+
+
+def simulate(data, init=None, fin=None, handlers=None, params=None,
+             stime_limit=None, loglevel=Logger.Level.INFO, extract=None,
+             precision=None, processes=None, warmup=None, coordinator=None,
+             seed=None, journal=None):
+    stime_limit = stime_limit if stime_limit is not None else 0
+
+    if precision is not None and extract is None:
+        raise ValueError('extract function required to estimate precision')
+    if processes is not None and coordinator is not None:
+        raise ValueError('processes and coordinator are mutually exclusive')
+    parallel = coordinator is not None or (
+            processes is not None and processes > 1)
+    if parallel and extract is None:
+        raise ValueError('extract function required to run in parallel')
+    if journal is not None and extract is None:
+        raise ValueError('extract function required to use journal')
+
+    def make_args(a_params):
+        return (data, init, fin, handlers, a_params, stime_limit, loglevel,
+                warmup)
+
+    points = params if isinstance(params, list) else [params]
+    results = [None] * len(points)
+    if journal is not None:
+        journal = _Journal(journal)
+        # Results depend on the model and extract functions too, so a sweep
+        # rerun with changed ones does not reuse stale records:
+        callables = tuple(_Journal.name(fn) for fn in (data, init, fin,
+                                                        extract))
+        handler_names = {key: _Journal.name(fn)
+                         for key, fn in (handlers or {}).items()}
+        settings = (stime_limit, warmup, seed, sorted(vars(precision).items())
+                    if precision is not None else None, callables,
+                    handler_names)
+        keys = [_Journal.key(p, *settings) for p in points]
+
+    def store(index, result):
+        results[index] = result
+        if journal is not None:
+            journal.append(keys[index], result)
+
+    # With a seed given, replication `i` of every point runs with seed
+    # `(seed, i)`, so the points use common random numbers:
+    def run_all(executor):
+        todo = []
+        for i in range(len(points)):
+            if journal is not None and keys[i] in journal:
+                results[i] = journal[keys[i]]
+            else:
+                todo.append(i)
+
+        if precision is not None:
+            for i in todo:
+                store(i, _replicate_until(executor, precision, extract,
+                                          make_args(points[i]), seed))
+        else:
+            seeds = None if seed is None else [(seed, 0)] * len(todo)
+            for j, result in executor.stream(
+                    extract, [make_args(points[i]) for i in todo], seeds):
+                store(todo[j], result)
+        return results if isinstance(params, list) else results[0]
+
+    if coordinator is not None:
+        return run_all(coordinator)
+    with _Executor(processes) as executor:
+        return run_all(executor)
+
+
 class _ModulesConnection:
     def __init__(self, manager, module, name):
         self.__manager = manager
@@ -471,6 +948,16 @@ class _ChildrenManager:
         for name, module in d.items():
             self.__setitem__(name, module)
 
+    def name_of(self, module):
+        for name, item in self.__container.items():
+            if item is module:
+                return name
+            if isinstance(item, tuple):
+                for i, sub_item in enumerate(item):
+                    if sub_item is module:
+                        return f'{name}.{i}'
+        raise KeyError('module is not a child')
+
     def all(self):
         result = []
         for name, module in self.__container.items():
@@ -489,6 +976,7 @@ class Model:
         self.__modules = {}
         self.__children_manager = _ChildrenManager(self, self.__children)
         self.__modules_manager = _ConnectionsManager(self, self.__modules)
+        self.__path = None
 
     @property
     def sim(self):
@@ -510,8 +998,28 @@ class Model:
     def parent(self):
         return self.__parent
 
+    @property
+    def path(self):
+        """Names of children leading to this module, joined with dots."""
+        if self.__parent is None:
+            return ''
+        if self.__path is None:
+            name = self.__parent.children.name_of(self)
+            parent_path = self.__parent.path
+            self.__path = f'{parent_path}.{name}' if parent_path else name
+        return self.__path
+
+    @property
+    def rng(self):
+        """Random generator of the stream named after the module path.
+
+        Use it after the module is added to its parent, e.g. in handlers.
+        """
+        return self.__sim.rng(self.path)
+
     def _set_parent(self, parent):
         self.__parent = parent
+        self.__path = None
 
     def handle_message(self, message, connection=None, sender=None):
         pass
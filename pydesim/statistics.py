@@ -1,33 +1,653 @@
+import array
+import bisect
+import math
+import os
+import pickle
+import tempfile
+import uuid
+import weakref
+from statistics import NormalDist
+
 import numpy as np
 
 
+def t_quantile(p, dof):
+    """Quantile of Student's t-distribution with `dof` degrees of freedom.
+
+    Exact for one and two degrees of freedom, Cornish-Fisher expansion
+    (Abramowitz and Stegun, 26.7.5) otherwise.
+    """
+    if not 0 < p < 1:
+        raise ValueError('probability must be in (0, 1)')
+    if dof < 1:
+        raise ValueError('positive degrees of freedom expected')
+    if dof == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if dof == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    z = NormalDist().inv_cdf(p)
+    g1 = (z**3 + z) / 4
+    g2 = (5 * z**5 + 16 * z**3 + 3 * z) / 96
+    g3 = (3 * z**7 + 19 * z**5 + 17 * z**3 - 15 * z) / 384
+    g4 = (79 * z**9 + 776 * z**7 + 1482 * z**5 - 1920 * z**3 - 945 * z) / 92160
+    return z + g1 / dof + g2 / dof**2 + g3 / dof**3 + g4 / dof**4
+
+
+def _mser(values, batch_size=5):
+    """Find MSER truncation point (in samples) for the given series.
+
+    Samples are grouped into batches of `batch_size` and the number of
+    leading batches minimizing the marginal standard error of the rest of
+    the series is selected (MSER-5 when `batch_size` is 5). Only truncation
+    points in the first half of the series are considered, since MSER is
+    unreliable when only a few batches are left.
+    """
+    num_batches = len(values) // batch_size
+    if num_batches < 2:
+        raise ValueError('too few samples')
+    batches = np.asarray(values[:num_batches * batch_size], dtype=float)
+    batches = batches.reshape(num_batches, batch_size).mean(axis=1)
+    batches -= batches.mean()
+    s1 = np.cumsum(batches[::-1])[::-1]
+    s2 = np.cumsum((batches ** 2)[::-1])[::-1]
+    m = np.arange(num_batches, 0, -1)
+    mser = (s2 - s1 ** 2 / m) / m ** 2
+    return int(np.argmin(mser[:num_batches // 2 + 1])) * batch_size
+
+
+def _welch(values, window=None, tol=0.05):
+    """Find truncation point (in samples) with Welch-style smoothing.
+
+    The series is smoothed by a moving average with the given window, and
+    the truncation point is the first sample after which the smoothed series
+    stays within `tol` (relative) of the mean of the second half of samples.
+    The band is never narrower than four standard deviations of the
+    smoothed series in the second half (or of a moving average of
+    independent samples with the same spread), so series settling near zero
+    are handled too.
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if n < 2:
+        raise ValueError('too few samples')
+    window = max(1, n // 20) if window is None else window
+    if window < 1 or window > n:
+        raise ValueError('window must be in [1, number of samples]')
+    cumsum = np.concatenate(([0.], np.cumsum(values)))
+    smoothed = (cumsum[window:] - cumsum[:-window]) / window
+    tail = values[n // 2:]
+    ref = tail.mean()
+    noise = max(smoothed[len(smoothed) // 2:].std(),
+                tail.std() / math.sqrt(window))
+    band = max(tol * abs(ref), 4 * noise)
+    outside = np.flatnonzero(np.abs(smoothed - ref) > band)
+    return int(outside[-1]) + 1 if len(outside) else 0
+
+
+def _warmup(values, method, batch_size, window, tol):
+    if method == 'mser':
+        return _mser(values, batch_size)
+    if method == 'welch':
+        return _welch(values, window, tol)
+    raise ValueError('invalid method')
+
+
+def _integral_at(times, values, points):
+    """Integrate a piecewise-constant function from `times[0]` to `points`.
+    """
+    cumulative = np.concatenate(([0.], np.cumsum(values[:-1] * np.diff(times))))
+    idx = np.searchsorted(times, points, side='right') - 1
+    idx = np.clip(idx, 0, len(times) - 1)
+    return cumulative[idx] + values[idx] * (points - times[idx])
+
+
+class _Buffer:
+    """Growable float array with amortized O(1) appends.
+
+    Samples are stored along the last axis of an array of shape
+    `shape + (capacity,)`, which is doubled when full. `view()` returns a
+    zero-copy read-only view of the filled part. A buffer may also wrap an
+    existing (e.g., memory-mapped) array, which is copied on the first write.
+
+    Single samples are staged in an `array.array`, which appends in C, and
+    moved into the NumPy array when the buffer is read or extended. For 1-D
+    buffers `append` is the bound `append()` of the staging array itself,
+    buffers of shape `(2,)` stage pairs with `append_pair()`. The staging
+    array is replaced after moving, so it is never resized while exported.
+    """
+    def __init__(self, shape=(), capacity=16):
+        self._array = np.empty(shape + (capacity,))
+        self._size = 0
+        self._width = math.prod(shape)  # staged values per sample
+        self._stage()
+
+    @classmethod
+    def wrap(cls, array):
+        buffer = cls.__new__(cls)
+        buffer._array = array
+        buffer._size = array.shape[-1]
+        buffer._width = math.prod(array.shape[:-1])
+        buffer._stage()
+        return buffer
+
+    def _stage(self):
+        self._staged = array.array('d')
+        self.append = self._staged.append
+
+    def _commit(self):
+        # Move staged samples to the end of the array:
+        if self._staged:
+            shape = self._array.shape[:-1]
+            values = np.frombuffer(self._staged).reshape(-1, *shape)
+            self._stage()
+            size = self._size + len(values)
+            self._reserve(size)
+            self._array[..., self._size:size] = np.moveaxis(values, 0, -1)
+            self._size = size
+
+    def __len__(self):
+        return self._size + len(self._staged) // self._width
+
+    def __reduce__(self):
+        return _Buffer.wrap, (np.array(self.view()),)
+
+    def _reserve(self, size):
+        capacity = self._array.shape[-1]
+        if size > capacity:
+            array = np.empty(self._array.shape[:-1] + (
+                max(size, 2 * capacity, 16),))
+            array[..., :self._size] = self._array[..., :self._size]
+            self._array = array
+
+    def append_pair(self, first, second):
+        staged = self._staged
+        staged.append(first)
+        staged.append(second)
+
+    def extend(self, values):
+        # Nothing is written for no values, so a wrapped read-only array is
+        # not modified:
+        if values.shape[-1] == 0:
+            return
+        self._commit()
+        size = self._size + values.shape[-1]
+        self._reserve(size)
+        self._array[..., self._size:size] = values
+        self._size = size
+
+    def extend_rows(self, rows):
+        # Same as `extend(np.stack(rows))`, but copies each row only once:
+        if len(rows[0]) == 0:
+            return
+        self._commit()
+        size = self._size + len(rows[0])
+        self._reserve(size)
+        for i, row in enumerate(rows):
+            self._array[i, self._size:size] = row
+        self._size = size
+
+    def last(self):
+        self._commit()
+        return self._array[..., self._size - 1]
+
+    def view(self):
+        self._commit()
+        view = self._array[..., :self._size]
+        view.flags.writeable = False
+        return view
+
+    def chunks(self, overlap=0):
+        yield self.view()
+
+
+class _DiskBuffer:
+    """Growable float array spilled to a temporary `.npy` file.
+
+    Samples are collected in an in-memory write buffer of `chunk_size`
+    samples, which is appended to the file when full. The file is stored in
+    Fortran order, so appended samples go to its end, and has a fixed-size
+    header rewritten with the new shape on each flush, so it is always a
+    valid `.npy` file. `view()` returns a read-only memory map of the file,
+    and `chunks()` iterates over it in parts of `chunk_size` samples. The
+    file is created in the default temporary directory (see `$TMPDIR`) and
+    removed with the buffer.
+    """
+    HEADER_SIZE = 128
+
+    def __init__(self, shape=(), chunk_size=1 << 16):
+        fd, self.path = tempfile.mkstemp(prefix='pydesim-', suffix='.npy')
+        self._file = os.fdopen(fd, 'w+b')
+        self._finalizer = weakref.finalize(
+            self, _DiskBuffer._remove, self._file, self.path)
+        self._shape = shape
+        self._chunk_size = chunk_size
+        self._num_stored = 0
+        self._pending = _Buffer(shape, chunk_size)
+        self._map = None
+        self._write_header()
+
+    @staticmethod
+    def _remove(file, path):
+        file.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+    def __len__(self):
+        return self._num_stored + len(self._pending)
+
+    def __reduce__(self):
+        return _Buffer.wrap, (np.array(self.view()),)
+
+    def _write_header(self):
+        shape = self._shape + (self._num_stored,)
+        text = "{'descr': '<f8', 'fortran_order': True, 'shape': %r, }" % (
+            shape,)
+        size = self.HEADER_SIZE - 10
+        self._file.seek(0)
+        self._file.write(b'\x93NUMPY\x01\x00' + size.to_bytes(2, 'little') +
+                         text.ljust(size - 1).encode('latin1') + b'\n')
+
+    def _write(self, values):
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.asarray(values, dtype='<f8').tobytes(order='F'))
+        self._num_stored += values.shape[-1]
+        self._write_header()
+        self._file.flush()
+        self._map = None
+
+    def flush(self):
+        if len(self._pending):
+            self._write(self._pending.view())
+            self._pending = _Buffer(self._shape, self._chunk_size)
+
+    def append(self, value):
+        # Only the staging array of the write buffer is checked, which is
+        # cheaper than `len()`:
+        self._pending.append(value)
+        if len(self._pending._staged) >= self._chunk_size:
+            self.flush()
+
+    def append_pair(self, first, second):
+        self._pending.append_pair(first, second)
+        if len(self._pending._staged) >= 2 * self._chunk_size:
+            self.flush()
+
+    def extend(self, values):
+        if len(self._pending) + values.shape[-1] < self._chunk_size:
+            self._pending.extend(values)
+        else:
+            self.flush()
+            self._write(values)
+
+    def extend_rows(self, rows):
+        self.extend(np.stack(rows))
+
+    def last(self):
+        if len(self._pending):
+            return self._pending.last()
+        return self.view()[..., -1]
+
+    def view(self):
+        self.flush()
+        if self._num_stored == 0:
+            view = np.empty(self._shape + (0,))
+            view.flags.writeable = False
+            return view
+        if self._map is None:
+            self._map = np.load(self.path, mmap_mode='r')
+        return self._map
+
+    def chunks(self, overlap=0):
+        view = self.view()
+        size = view.shape[-1]
+        for start in range(0, max(size - overlap, 1), self._chunk_size):
+            yield view[..., start:start + self._chunk_size + overlap]
+
+
+def _new_buffer(storage, shape=()):
+    if storage == 'memory':
+        return _Buffer(shape)
+    if storage == 'disk':
+        return _DiskBuffer(shape)
+    raise ValueError('invalid storage')
+
+
+class _Moments:
+    """Count, mean and sums of central powers M2, M3 and M4 of samples.
+
+    Samples are added with Welford's update extended to higher moments, and
+    two accumulators are combined with the pairwise formulas of Pebay (2008).
+    """
+    __slots__ = ('n', 'mean', 'm2', 'm3', 'm4')
+
+    def __init__(self, n=0, mean=0., m2=0., m3=0., m4=0.):
+        self.n, self.mean, self.m2, self.m3, self.m4 = n, mean, m2, m3, m4
+
+    @classmethod
+    def of(cls, values):
+        values = np.asarray(values, dtype=float)
+        if len(values) == 0:
+            return cls()
+        mean = values.mean()
+        dev = values - mean
+        dev2 = dev * dev
+        return cls(len(values), float(mean), float(dev2.sum()),
+                   float((dev2 * dev).sum()), float((dev2 * dev2).sum()))
+
+    def add(self, x):
+        n1 = self.n
+        self.n = n = n1 + 1
+        delta = x - self.mean
+        delta_n = delta / n
+        delta_n2 = delta_n * delta_n
+        term1 = delta * delta_n * n1
+        self.mean += delta_n
+        self.m4 += term1 * delta_n2 * (n * n - 3 * n + 3) + \
+            6 * delta_n2 * self.m2 - 4 * delta_n * self.m3
+        self.m3 += term1 * delta_n * (n - 2) - 3 * delta_n * self.m2
+        self.m2 += term1
+
+    def merge(self, other):
+        na, nb = self.n, other.n
+        if nb == 0:
+            return
+        if na == 0:
+            self.n, self.mean, self.m2, self.m3, self.m4 = \
+                other.n, other.mean, other.m2, other.m3, other.m4
+            return
+        n = na + nb
+        delta = other.mean - self.mean
+        delta2 = delta * delta
+        self.m4 += other.m4 + delta2 * delta2 * na * nb * (
+                na * na - na * nb + nb * nb) / n ** 3 + \
+            6 * delta2 * (na * na * other.m2 + nb * nb * self.m2) / n ** 2 + \
+            4 * delta * (na * other.m3 - nb * self.m3) / n
+        self.m3 += other.m3 + delta2 * delta * na * nb * (na - nb) / n ** 2 + \
+            3 * delta * (na * other.m2 - nb * self.m2) / n
+        self.m2 += other.m2 + delta2 * na * nb / n
+        self.mean += delta * nb / n
+        self.n = n
+
+    def state(self):
+        return self.n, self.mean, self.m2, self.m3, self.m4
+
+    def raw_moment(self, k):
+        if k > 4:
+            raise ValueError('moments of order above 4 require samples')
+        central = (1., 0., self.m2 / self.n, self.m3 / self.n,
+                   self.m4 / self.n)
+        return sum(math.comb(k, j) * self.mean ** (k - j) * central[j]
+                   for j in range(k + 1))
+
+
+class _Batches:
+    """Sums of consecutive equal-size batches of samples in bounded memory.
+
+    Batches start with a single sample each. When `2 * capacity` batches are
+    complete, adjacent batches are merged and the batch size is doubled. The
+    samples of the last incomplete batch are kept in a partial sum.
+    """
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.size = 1
+        self.sums = []
+        self.partial_sum = 0.
+        self.partial_count = 0
+
+    def add(self, x):
+        self.partial_sum += x
+        self.partial_count += 1
+        if self.partial_count == self.size:
+            self._complete_partial()
+
+    def add_many(self, values):
+        i, n = 0, len(values)
+        while i < n:
+            if self.partial_count or n - i < self.size:
+                count = min(self.size - self.partial_count, n - i)
+                self.partial_sum += float(values[i:i + count].sum())
+                self.partial_count += count
+                i += count
+                if self.partial_count == self.size:
+                    self._complete_partial()
+            else:
+                num = min((n - i) // self.size,
+                          2 * self.capacity - len(self.sums))
+                end = i + num * self.size
+                self.sums.extend(
+                    values[i:end].reshape(num, self.size).sum(axis=1).tolist())
+                i = end
+                if len(self.sums) == 2 * self.capacity:
+                    self._collapse()
+
+    def _complete_partial(self):
+        self.sums.append(self.partial_sum)
+        self.partial_sum, self.partial_count = 0., 0
+        if len(self.sums) == 2 * self.capacity:
+            self._collapse()
+
+    def _collapse(self):
+        if len(self.sums) % 2:
+            # The last batch becomes a part of the new partial batch:
+            self.partial_sum += self.sums.pop()
+            self.partial_count += self.size
+        self.sums = [a + b for a, b in zip(self.sums[::2], self.sums[1::2])]
+        self.size *= 2
+
+    def merge(self, other):
+        """Append batches of `other`, as if its samples followed these ones.
+
+        Since samples are not kept, the partial batch of this accumulator is
+        dropped, and the partial batch of `other` becomes the new one.
+        """
+        other = _Batches.from_state(other.state())
+        while self.size < other.size:
+            self._collapse()
+        while other.size < self.size:
+            other._collapse()
+        self.sums.extend(other.sums)
+        self.partial_sum, self.partial_count = \
+            other.partial_sum, other.partial_count
+        while len(self.sums) >= 2 * self.capacity:
+            self._collapse()
+
+    def state(self):
+        return {'capacity': self.capacity, 'size': self.size,
+                'sums': list(self.sums), 'partial_sum': self.partial_sum,
+                'partial_count': self.partial_count}
+
+    @classmethod
+    def from_state(cls, state):
+        batches = cls(state['capacity'])
+        batches.size = state['size']
+        batches.sums = list(state['sums'])
+        batches.partial_sum = state['partial_sum']
+        batches.partial_count = state['partial_count']
+        return batches
+
+    def means(self, num_batches):
+        # Kept batches are split into groups differing by at most one batch,
+        # so only the partial batch is not used:
+        num_complete = len(self.sums)
+        if num_complete < num_batches:
+            raise ValueError('statistic has too few samples')
+        bounds = np.arange(num_batches + 1) * num_complete // num_batches
+        sums = np.add.reduceat(np.asarray(self.sums), bounds[:-1])
+        return sums / (np.diff(bounds) * self.size)
+
+
+class _Reservoir:
+    """Uniform random sample of at most `size` samples (Vitter's Algorithm
+    L). After the reservoir is filled, the number of samples to skip until
+    the next kept one is drawn at once, so skipped samples are only counted.
+    """
+    def __init__(self, size, rng=None):
+        if size < 1 or int(size) != size:
+            raise ValueError('positive integer reservoir size expected')
+        self.size = int(size)
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.samples = np.empty(self.size)
+        self.count = 0
+        self._weight = math.exp(math.log(self.rng.random()) / self.size)
+        self._next = self.size + self._skip()
+
+    def _skip(self):
+        return math.floor(math.log(self.rng.random()) /
+                          math.log(1 - self._weight))
+
+    def _keep(self, value):
+        self.samples[self.rng.integers(self.size)] = value
+        self._weight *= math.exp(math.log(self.rng.random()) / self.size)
+        self._next += self._skip() + 1
+
+    def add(self, x):
+        if self.count < self.size:
+            self.samples[self.count] = x
+        elif self.count == self._next:
+            self._keep(x)
+        self.count += 1
+
+    def add_many(self, values):
+        num_filled = max(0, min(self.size - self.count, len(values)))
+        self.samples[self.count:self.count + num_filled] = values[:num_filled]
+        end = self.count + len(values)
+        while self._next < end:
+            self._keep(values[self._next - self.count])
+        self.count = end
+
+    def kept(self):
+        return self.samples[:min(self.count, self.size)]
+
+    def merge(self, other):
+        if other.size != self.size:
+            raise ValueError('reservoirs have different sizes')
+        a, b = self.kept(), other.kept()
+        total = self.count + other.count
+        if total <= self.size:
+            self.samples[len(a):total] = b
+        else:
+            # Number of samples coming from this reservoir in a uniform
+            # sample of the union:
+            num_own = self.rng.hypergeometric(self.count, other.count,
+                                              self.size)
+            self.samples = np.concatenate((
+                self.rng.choice(a, num_own, replace=False),
+                self.rng.choice(b, self.size - num_own, replace=False)))
+            # The largest random key of kept samples is distributed as the
+            # size-th smallest of `total` uniform keys:
+            self._weight = self.rng.beta(self.size, total - self.size + 1)
+            self._next = total + self._skip()
+        self.count = total
+
+    def state(self):
+        return {'size': self.size, 'samples': self.kept().copy(),
+                'count': self.count, 'weight': self._weight,
+                'next': self._next}
+
+    @classmethod
+    def from_state(cls, state, rng=None):
+        reservoir = cls(state['size'], rng)
+        reservoir.samples[:len(state['samples'])] = state['samples']
+        reservoir.count = state['count']
+        reservoir._weight, reservoir._next = state['weight'], state['next']
+        return reservoir
+
+
+def _check_num_batches(num_batches, min_value=1):
+    if np.abs(np.round(num_batches) - num_batches) > 0 or \
+            num_batches < min_value:
+        raise ValueError(f'integer number of batches >= {min_value} expected')
+    return int(num_batches)
+
+
 class Statistic:
-    def __init__(self, data=None):
-        if data is not None:
-            self._data = list(data)
+    """Collection of samples, e.g. packet delays.
+
+    By default, all samples are stored in a growable float array, so
+    `asarray()` is a zero-copy view. With `store=False` only the count,
+    mean and central moments are kept, so `mean()`, `std()`, `var()` and
+    `moment(k)` for `k <= 4` take O(1) memory and time, while methods needing
+    the samples themselves raise `ValueError`. Batch means are then kept for
+    at most 128 batches, whose size doubles as samples arrive.
+
+    With `storage='disk'` samples are spilled to a temporary file and read
+    via a memory map, so very long runs need bounded RAM.
+
+    With `reservoir_size=k` the statistic is streaming and additionally
+    keeps a uniform random sample of at most `k` samples, available from
+    `reservoir()`. Random numbers are taken from the numpy generator `rng`
+    (e.g., `sim.rng('name')`), or from a new one by default.
+    """
+    def __init__(self, data=None, store=True, storage='memory',
+                 reservoir_size=None, rng=None):
+        self._storage = storage
+        self._reservoir = None
+        if store and reservoir_size is None:
+            self._data = _new_buffer(storage)
+            self._moments = None
+            self._batches = None
         else:
-            self._data = []
+            self._data = None
+            self._moments = _Moments()
+            self._batches = _Batches()
+            if reservoir_size is not None:
+                self._reservoir = _Reservoir(reservoir_size, rng)
+        if data is not None:
+            self.extend(data)
+
+    @property
+    def store(self):
+        return self._moments is None
+
+    def _samples(self):
+        if self._data is None:
+            raise ValueError('statistic does not store samples')
+        return self._data
 
     def append(self, value):
-        self._data.append(value)
+        if self._data is not None:
+            self._data.append(value)
+        else:
+            self._moments.add(value)
+            self._batches.add(value)
+            if self._reservoir is not None:
+                self._reservoir.add(value)
 
     def extend(self, data):
-        self._data.extend(data)
+        if not isinstance(data, np.ndarray):
+            data = list(data)
+        data = np.asarray(data, dtype=float)
+        if self._moments is not None:
+            self._moments.merge(_Moments.of(data))
+            self._batches.add_many(data)
+            if self._reservoir is not None:
+                self._reservoir.add_many(data)
+        else:
+            self._data.extend(data)
 
     def mean(self):
         if self.empty:
             raise ValueError('no data')
-        return self.asarray().mean()
+        if self._moments is not None:
+            return self._moments.mean
+        return sum(chunk.sum() for chunk in self._data.chunks()) / len(self)
+
+    def _stored_moments(self):
+        moments = _Moments()
+        for chunk in self._data.chunks():
+            moments.merge(_Moments.of(chunk))
+        return moments
 
     def std(self):
-        if self.empty:
-            raise ValueError('no data')
-        return self.asarray().std()
+        return math.sqrt(self.var())
 
     def var(self):
         if self.empty:
             raise ValueError('no data')
-        return self.asarray().var()
+        moments = self._moments or self._stored_moments()
+        return moments.m2 / moments.n
 
     def moment(self, k):
         n = len(self)
@@ -35,7 +655,10 @@ class Statistic:
             raise ValueError('no data')
         if np.abs(np.round(k) - k) > 0 or k <= 0:
             raise ValueError('positive integer expected')
-        return sum((x ** k for x in self._data)) / n
+        if self._moments is not None:
+            return self._moments.raw_moment(int(k))
+        return sum(np.power(chunk, int(k)).sum()
+                   for chunk in self._data.chunks()) / n
 
     def lag(self, k):
         n = len(self)
@@ -50,63 +673,301 @@ class Statistic:
             return 1
         return np.corrcoef(ar[k:], ar[:-k])[0, 1]
 
+    def acf(self, max_lag=None):
+        """Get autocorrelations for lags from 0 to `max_lag` (by default,
+        to the last one), computed via FFT in O(n log n) time.
+        """
+        n = len(self)
+        if n < 2:
+            raise ValueError('statistic has too few samples')
+        if max_lag is None:
+            max_lag = n - 1
+        if np.abs(np.round(max_lag) - max_lag) > 0 or not 0 <= max_lag < n:
+            raise ValueError('integer lag in [0, n) expected')
+        x = self.asarray() - self.mean()
+        size = 1 << (2 * n - 1).bit_length()
+        spectrum = np.fft.rfft(x, size)
+        acov = np.fft.irfft(spectrum * spectrum.conj(), size)[:int(max_lag) + 1]
+        if acov[0] <= 0:
+            raise ValueError('samples have zero variance')
+        return acov / acov[0]
+
+    def autocorrelation_time(self, c=5):
+        """Estimate the integrated autocorrelation time
+        `tau = 1 + 2 * sum(acf(k))`, summing over lags `k <= M` with the
+        smallest window `M >= c * tau(M)` (Sokal). Samples are then worth
+        about `n / tau` independent ones, and batches for `batch_means()`
+        should be much longer than `tau`.
+        """
+        taus = 2 * np.cumsum(self.acf()) - 1
+        outside = np.arange(len(taus)) >= c * taus
+        return float(taus[np.argmax(outside)] if outside.any() else taus[-1])
+
+    def batch_means(self, num_batches):
+        """Split samples into `num_batches` consecutive batches of equal size
+        and return their means.
+
+        If samples are not split evenly, the first ones are dropped. For a
+        streaming statistic, batches are built from the kept batches of equal
+        size, and their number may differ by one between batches. Only the
+        samples of the last incomplete kept batch (fewer than the kept batch
+        size) are not used.
+        """
+        num_batches = _check_num_batches(num_batches)
+        if self._batches is not None:
+            return self._batches.means(num_batches)
+        data = self.asarray()
+        size = len(data) // num_batches
+        if size == 0:
+            raise ValueError('statistic has too few samples')
+        return data[len(data) - size * num_batches:].reshape(
+            num_batches, size).mean(axis=1)
+
+    def confidence_interval(self, level=0.95, method='batch_means',
+                            num_batches=20):
+        """Estimate the confidence interval of the mean.
+
+        With `method='batch_means'`, means of `num_batches` batches are
+        treated as independent samples, which is valid for autocorrelated
+        samples of a single long run if batches are large enough. With
+        `method='iid'` samples are assumed to be independent.
+        """
+        if not 0 < level < 1:
+            raise ValueError('level must be in (0, 1)')
+        if method == 'batch_means':
+            means = self.batch_means(_check_num_batches(num_batches, 2))
+            n, center, std = len(means), means.mean(), means.std(ddof=1)
+        elif method == 'iid':
+            n = len(self)
+            if n < 2:
+                raise ValueError('statistic has too few samples')
+            center, std = self.mean(), math.sqrt(self.var() * n / (n - 1))
+        else:
+            raise ValueError('invalid method')
+        half_width = t_quantile((1 + level) / 2, n - 1) * std / math.sqrt(n)
+        return center - half_width, center + half_width
+
+    def warmup(self, method='mser', batch_size=5, window=None, tol=0.05):
+        """Estimate the number of initial samples belonging to warm-up.
+
+        Supported methods are `'mser'` (MSER with batches of `batch_size`
+        samples) and `'welch'` (moving average with the given `window`
+        staying within relative tolerance `tol` of the steady-state mean, or
+        within its noise if wider).
+        """
+        if self.empty:
+            raise ValueError('no data')
+        return _warmup(self.asarray(), method, batch_size, window, tol)
+
+    def reset(self):
+        if self._moments is not None:
+            self._moments = _Moments()
+            self._batches = _Batches()
+            if self._reservoir is not None:
+                self._reservoir = _Reservoir(self._reservoir.size,
+                                             self._reservoir.rng)
+        else:
+            self._data = _new_buffer(self._storage)
+
     def __len__(self):
+        if self._moments is not None:
+            return self._moments.n
         return len(self._data)
 
     @property
     def empty(self):
-        return len(self._data) == 0
+        return len(self) == 0
 
     def as_list(self):
-        return list(self._data)
+        return self.asarray().tolist()
 
     def as_tuple(self):
-        return tuple(self._data)
+        return tuple(self.asarray().tolist())
 
     def asarray(self):
-        return np.asarray(self._data)
+        return self._samples().view()
+
+    def reservoir(self):
+        """Get a copy of the uniform random sample kept with
+        `reservoir_size`.
+        """
+        if self._reservoir is None:
+            raise ValueError('statistic has no reservoir')
+        return self._reservoir.kept().copy()
+
+    def quantile(self, q):
+        return np.quantile(self.asarray(), q)
 
     def pmf(self):
-        values = {}
-        for v in self._data:
-            if v not in values:
-                values[v] = 1
-            else:
-                values[v] += 1
-        return values
+        values, counts = self.pmf_arrays()
+        return dict(zip(values.tolist(), counts.tolist()))
+
+    def pmf_arrays(self):
+        """Get sorted distinct values and their counts, like `pmf()` does.
+        """
+        distinct, counts = [], []
+        for chunk in self._samples().chunks():
+            chunk_distinct, chunk_counts = np.unique(chunk, return_counts=True)
+            distinct.append(chunk_distinct)
+            counts.append(chunk_counts)
+        if len(distinct) == 1:
+            return distinct[0], counts[0]
+        distinct, inverse = np.unique(np.concatenate(distinct),
+                                      return_inverse=True)
+        counts = np.bincount(inverse, weights=np.concatenate(counts),
+                             minlength=len(distinct))
+        return distinct, counts.astype(np.int64)
+
+    def merge(self, other):
+        """Add samples of `other`, e.g. of another replication.
+
+        A stored statistic appends the samples of `other`, which must be
+        stored too. A streaming statistic combines moments exactly (Chan and
+        Pebay formulas) and appends batches, see `batch_means()`.
+        """
+        if self._moments is None:
+            if other._moments is not None:
+                raise ValueError('streaming statistic can not be merged '
+                                 'into stored one')
+            self._data.extend(other.asarray())
+        elif other._moments is None:
+            self.extend(other.asarray())
+        else:
+            if self._reservoir is not None:
+                if other._reservoir is None:
+                    raise ValueError('statistic without reservoir can not '
+                                     'be merged into one with reservoir')
+                self._reservoir.merge(other._reservoir)
+            self._moments.merge(other._moments)
+            self._batches.merge(other._batches)
+
+    def state(self):
+        """Get a compact picklable state, see `from_state()`. For a streaming
+        statistic it takes a few kilobytes regardless of the number of
+        samples.
+        """
+        if self._moments is None:
+            return {'samples': self.asarray()}
+        return {'moments': self._moments.state(),
+                'batches': self._batches.state(),
+                'reservoir': None if self._reservoir is None else
+                self._reservoir.state()}
+
+    @classmethod
+    def from_state(cls, state, rng=None):
+        if 'samples' in state:
+            st = cls()
+            st._data = _Buffer.wrap(np.asarray(state['samples'], dtype=float))
+            return st
+        st = cls(store=False)
+        st._moments = _Moments(*state['moments'])
+        st._batches = _Batches.from_state(state['batches'])
+        if state.get('reservoir') is not None:
+            st._reservoir = _Reservoir.from_state(state['reservoir'], rng)
+        return st
+
+    def save(self, path):
+        """Save to directory `path`, see `load()`."""
+        _save(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a statistic saved with `save()`. Samples are memory-mapped,
+        so they are read from disk only when used, and copied on the first
+        modification.
+        """
+        return _load(path, cls)
 
 
 class Trace:
-    def __init__(self, data=None, mode='auto'):
+    """Values changing at ordered timestamps, e.g. a queue size.
+
+    Timestamps and values are stored as two rows of a growable float array,
+    so `asarray('split')` returns a zero-copy read-only view. With
+    `storage='disk'` records are spilled to a temporary file, see
+    `Statistic`.
+    """
+    def __init__(self, data=None, mode='auto', storage='memory'):
+        self._storage = storage
+        self._data = _new_buffer(storage, (2,))
+        self._last_time = -math.inf  # cached to keep `record()` cheap
         if data is not None:
-            try:
-                valid_as_samples = all(len(item) == 2 for item in data)
-                valid_as_split = len(data) == 2 and len(data[0]) == len(data[1])
-            except TypeError as e:
-                raise ValueError('wrong data shape') from e
+            if isinstance(data, np.ndarray) or (
+                    isinstance(data, (list, tuple)) and len(data) == 2 and
+                    all(isinstance(item, np.ndarray) for item in data)):
+                array = self._split_array(data, mode)
             else:
-                if not valid_as_samples and not valid_as_split:
-                    raise ValueError('wrong data shape')
+                array = self._split_sequence(data, mode)
+            if np.any(np.diff(array[0]) < 0):
+                raise ValueError('data must be ordered by time')
+            self._data.extend(array)
+            if array.shape[1]:
+                self._last_time = float(array[0, -1])
 
-                if (mode == 'auto' and valid_as_samples) or mode == 'samples':
-                    _data = [(t, v) for (t, v) in data]
-                elif mode in {'auto', 'split'}:
-                    _data = [(t, v) for t, v in zip(*data)]
-                else:
-                    raise ValueError('invalid mode')
+    @staticmethod
+    def _split_array(data, mode):
+        # Fast path for an array of shape (N, 2) or (2, N), or a pair of
+        # arrays, with the same rules as for sequences:
+        try:
+            array = np.asarray(data, dtype=float)
+        except ValueError as e:
+            raise ValueError('wrong data shape') from e
+        if array.size == 0 and array.ndim <= 2:
+            return np.empty((2, 0))
+        if array.ndim != 2 or 2 not in array.shape:
+            raise ValueError('wrong data shape')
+        valid_as_samples = array.shape[1] == 2
+        if (mode == 'auto' and valid_as_samples) or mode == 'samples':
+            if not valid_as_samples:
+                raise ValueError('wrong data shape')
+            return array.T
+        elif mode in {'auto', 'split'}:
+            if array.shape[0] != 2:
+                raise ValueError('wrong data shape')
+            return array
+        raise ValueError('invalid mode')
 
-                ar = np.asarray(_data).transpose()[0]
-                if np.any((ar[1:] - ar[:-1]) < 0):
-                    raise ValueError('data must be ordered by time')
+    @staticmethod
+    def _split_sequence(data, mode):
+        try:
+            valid_as_samples = all(len(item) == 2 for item in data)
+            valid_as_split = len(data) == 2 and len(data[0]) == len(data[1])
+        except TypeError as e:
+            raise ValueError('wrong data shape') from e
+        if not valid_as_samples and not valid_as_split:
+            raise ValueError('wrong data shape')
 
-                self._data = _data
-        else:
-            self._data = []
+        if (mode == 'auto' and valid_as_samples) or mode == 'samples':
+            if not valid_as_samples:
+                raise ValueError('wrong data shape')
+            return np.asarray([(t, v) for (t, v) in data],
+                              dtype=float).reshape(-1, 2).T
+        elif mode in {'auto', 'split'}:
+            if not valid_as_split:
+                raise ValueError('wrong data shape')
+            return np.asarray([data[0], data[1]], dtype=float)
+        raise ValueError('invalid mode')
 
     def record(self, t, v):
-        if self._data and t < self._data[-1][0]:
+        if t < self._last_time:
+            raise ValueError('adding data in past prohibited')
+        self._data.append_pair(t, v)
+        self._last_time = t
+
+    def record_many(self, times, values):
+        """Record values at ordered times given as arrays, like calling
+        `record()` for each pair.
+        """
+        times = np.asarray(times, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if times.ndim != 1 or times.shape != values.shape:
+            raise ValueError('wrong data shape')
+        if len(times) == 0:
+            return
+        if np.any(np.diff(times) < 0) or times[0] < self._last_time:
             raise ValueError('adding data in past prohibited')
-        self._data.append((t, v),)
+        self._data.extend_rows((times, values))
+        self._last_time = float(times[-1])
 
     @property
     def empty(self):
@@ -116,32 +977,193 @@ class Trace:
         return len(self._data)
 
     def pmf(self):
+        values, probs = self.pmf_arrays()
+        return dict(zip(values.tolist(), probs.tolist()))
+
+    def pmf_arrays(self):
+        """Return distinct values and fractions of time the trace had them.
+        A single record gives empty arrays.
+        """
         if self.empty:
             raise ValueError('expected non-empty values')
-        values = {}
-        for i in range(0, len(self._data) - 1):
-            v, dt = self._data[i][1], self._data[i + 1][0] - self._data[i][0]
-            if self._data[i][1] not in values:
-                values[v] = dt
-            else:
-                values[v] += dt
-        total_time = sum(values.values())
-        values = {v: t / total_time for v, t in values.items()}
-        return values
+        times = self._data.view()[0]
+        duration = times[-1] - times[0]
+        if len(self) > 1 and duration == 0:
+            raise ValueError('trace has zero duration')
+        distinct, weights = [], []
+        for chunk_times, chunk_values in self._data.chunks(overlap=1):
+            durations = np.diff(chunk_times)
+            chunk_distinct, inverse = np.unique(chunk_values[:-1],
+                                                return_inverse=True)
+            distinct.append(chunk_distinct)
+            weights.append(np.bincount(inverse, weights=durations,
+                                       minlength=len(chunk_distinct)))
+        if len(distinct) > 1:
+            distinct, inverse = np.unique(np.concatenate(distinct),
+                                          return_inverse=True)
+            weights = [np.bincount(inverse, weights=np.concatenate(weights),
+                                   minlength=len(distinct))]
+        else:
+            distinct = distinct[0]
+        if len(self) == 1:
+            return distinct, weights[0]
+        return distinct, weights[0] / duration
 
     def timeavg(self):
-        return sum(v * p for v, p in self.pmf().items())
+        values, probs = self.pmf_arrays()
+        return float(np.dot(values, probs))
+
+    def _time_pmf(self):
+        values, probs = self.pmf_arrays()
+        if len(values) == 0:
+            raise ValueError('trace has zero duration')
+        return values, probs
+
+    def time_cdf(self):
+        """Return sorted distinct values and fractions of time the trace had
+        values not greater than them.
+        """
+        values, probs = self._time_pmf()
+        return values, np.cumsum(probs)
+
+    def time_quantile(self, q):
+        """Get the smallest value the trace was not above for at least `q`
+        fraction of time. `q` may be a number or an array.
+        """
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError('quantile must be in [0, 1]')
+        values, cdf = self.time_cdf()
+        # Rounding may leave the last cumulative sum slightly below one:
+        idx = np.minimum(np.searchsorted(cdf, q), len(values) - 1)
+        result = values[idx]
+        return float(result) if result.ndim == 0 else result
+
+    def fraction_above(self, threshold):
+        """Get the fraction of time the trace was above `threshold`."""
+        values, probs = self._time_pmf()
+        return float(probs[values > threshold].sum())
+
+    def warmup(self, method='mser', num_batches=None, window=None, tol=0.05):
+        """Estimate the time when the warm-up period ends.
+
+        The trace is split into `num_batches` intervals of equal duration
+        and the time averages over these intervals are analyzed with MSER
+        (`'mser'`) or Welch-style (`'welch'`) method, see `Statistic.warmup`.
+        """
+        if len(self._data) < 2:
+            raise ValueError('too few samples')
+        times, values = self._data.view()
+        duration = times[-1] - times[0]
+        if duration <= 0:
+            raise ValueError('trace has zero duration')
+        if num_batches is None:
+            num_batches = min(1000, max(2, (len(times) - 1) // 5))
+        edges = np.linspace(times[0], times[-1], num_batches + 1)
+        averages = np.diff(_integral_at(times, values, edges)) / (
+                duration / num_batches)
+        index = _warmup(averages, method, 1, window, tol)
+        return times[0] + index * duration / num_batches
+
+    def _grid(self, step, start, end):
+        if self.empty:
+            raise ValueError('expected non-empty values')
+        if step <= 0:
+            raise ValueError('positive step expected')
+        times = self._data.view()[0]
+        start = times[0] if start is None else start
+        end = times[-1] if end is None else end
+        if end < start:
+            raise ValueError('end must not precede start')
+        return start + step * np.arange(int((end - start) / step) + 1)
+
+    def resample(self, step, start=None, end=None):
+        """Return times `start, start + step, ...` up to `end` (by default,
+        the first and last record times) and the values at these times.
+        Values before the first record are NaN.
+        """
+        grid = self._grid(step, start, end)
+        times, values = self._data.view()
+        idx = np.searchsorted(times, grid, side='right') - 1
+        return grid, np.where(idx >= 0, values[np.maximum(idx, 0)], np.nan)
+
+    def window_timeavg(self, window, step=None):
+        """Return time averages over sliding windows of duration `window`
+        ending every `step` (by default, `window`) time units, together with
+        window end times.
+        """
+        if window <= 0:
+            raise ValueError('positive window expected')
+        times, values = self._data.view()
+        if len(times) and times[-1] - times[0] < window:
+            raise ValueError('trace is shorter than window')
+        step = window if step is None else step
+        ends = self._grid(step, None if self.empty else times[0] + window,
+                          None)
+        integrals = _integral_at(times, values, np.concatenate(
+            (ends - window, ends)))
+        return ends, (integrals[len(ends):] - integrals[:len(ends)]) / window
+
+    def downsample(self, num_bins):
+        """Split the trace into `num_bins` intervals of equal duration and
+        return interval start times with minimum and maximum values taken
+        within each interval, e.g. for plotting long traces.
+        """
+        if self.empty:
+            raise ValueError('expected non-empty values')
+        num_bins = _check_num_batches(num_bins)
+        times, values = self._data.view()
+        edges = np.linspace(times[0], times[-1], num_bins + 1)[:-1]
+        # Values at the interval starts (held from earlier records):
+        held = values[np.searchsorted(times, edges, side='right') - 1]
+        duration = times[-1] - times[0]
+        if duration > 0:
+            bins = ((times - times[0]) * (num_bins / duration)).astype(np.int64)
+            bins = np.minimum(bins, num_bins - 1)
+        else:
+            bins = np.zeros(len(times), dtype=np.int64)
+        minimums, maximums = held.copy(), held.copy()
+        np.minimum.at(minimums, bins, values)
+        np.maximum.at(maximums, bins, values)
+        return edges, minimums, maximums
+
+    def state(self):
+        return {'split': self._data.view()}
+
+    @classmethod
+    def from_state(cls, state):
+        trace = cls()
+        trace._data = _Buffer.wrap(
+            np.asarray(state['split'], dtype=float).reshape(2, -1))
+        if len(trace._data):
+            trace._last_time = float(trace._data.last()[0])
+        return trace
+
+    def save(self, path):
+        """Save to directory `path`, see `Statistic.save()`."""
+        _save(self, path)
+
+    @classmethod
+    def load(cls, path):
+        return _load(path, cls)
+
+    def reset(self, t=None):
+        """Remove all records. If `t` is given, the last recorded value is
+        kept as the value at time `t`.
+        """
+        last = self._data.last()[1] if len(self._data) else None
+        self._data = _new_buffer(self._storage, (2,))
+        self._last_time = -math.inf
+        if t is not None and last is not None:
+            self._data.append_pair(t, last)
+            self._last_time = t
 
     def _convert(self, fn, mode):
         if mode == 'samples':
-            return fn(fn([t, v]) for (t, v) in self._data)
+            return fn(fn(item) for item in self._data.view().T.tolist())
         elif mode == 'split':
-            timestamps, values = [], []
-            for (t, v) in self._data:
-                timestamps.append(t)
-                values.append(v)
-            if timestamps:
-                return fn([fn(timestamps), fn(values)])
+            if len(self._data):
+                return fn(fn(row) for row in self._data.view().tolist())
             return fn()
         else:
             raise ValueError('invalid mode')
@@ -153,48 +1175,868 @@ class Trace:
         return self._convert(tuple, mode)
 
     def asarray(self, mode='samples'):
-        return np.asarray(self.as_list(mode))
+        if mode not in {'samples', 'split'}:
+            raise ValueError('invalid mode')
+        if self.empty:
+            return np.asarray([])
+        view = self._data.view()
+        return view.T if mode == 'samples' else view
+
+
+class TimeAverage:
+    """Time-weighted mean, variance and pmf of values recorded at ordered
+    timestamps, computed incrementally without keeping the history.
+
+    The API follows `Trace`: a recorded value is held until the next record.
+    Methods accept an optional time `t`, up to which the last value is
+    considered held. Per-value occupancy for `pmf()` takes memory
+    proportional to the number of distinct values, so it may be disabled
+    with `track_pmf=False` for continuous values.
+    """
+    def __init__(self, track_pmf=True):
+        self._count = 0
+        self._time = self._value = None
+        self._duration = self._mean = self._m2 = 0.
+        self._occupancy = {} if track_pmf else None
+
+    def record(self, t, v):
+        if self._time is not None:
+            if t < self._time:
+                raise ValueError('adding data in past prohibited')
+            self._duration, self._mean, self._m2 = self._integrate(t)
+            if self._occupancy is not None:
+                self._occupancy[self._value] = \
+                    self._occupancy.get(self._value, 0.) + (t - self._time)
+        self._time, self._value = t, v
+        self._count += 1
+
+    def _integrate(self, t):
+        # Weighted Welford update with the last value held until `t`:
+        dt = t - self._time
+        if dt <= 0:
+            return self._duration, self._mean, self._m2
+        duration = self._duration + dt
+        delta = self._value - self._mean
+        mean = self._mean + delta * dt / duration
+        return duration, mean, self._m2 + dt * delta * (self._value - mean)
+
+    def _totals(self, t):
+        if self._count == 0:
+            raise ValueError('expected non-empty values')
+        if t is None or self._time is None:
+            totals = self._duration, self._mean, self._m2
+        elif t < self._time:
+            raise ValueError('time must not precede the last record')
+        else:
+            totals = self._integrate(t)
+        if totals[0] <= 0:
+            raise ValueError('trace has zero duration')
+        return totals
+
+    @property
+    def empty(self):
+        return self._count == 0
+
+    def __len__(self):
+        return self._count
+
+    def timeavg(self, t=None):
+        return self._totals(t)[1]
+
+    def var(self, t=None):
+        duration, _, m2 = self._totals(t)
+        return m2 / duration
+
+    def std(self, t=None):
+        return math.sqrt(self.var(t))
+
+    def pmf(self, t=None):
+        if self._occupancy is None:
+            raise ValueError('pmf is not tracked')
+        duration = self._totals(t)[0]
+        occupancy = dict(self._occupancy)
+        if t is not None and self._time is not None:
+            occupancy[self._value] = \
+                occupancy.get(self._value, 0.) + (t - self._time)
+        return {v: dt / duration for v, dt in occupancy.items()}
+
+    def merge(self, other):
+        """Add time-weighted values accumulated by `other`, e.g. in another
+        replication. The last value of `other` is not counted, since its
+        duration is unknown.
+        """
+        if other._duration > 0:
+            duration = self._duration + other._duration
+            delta = other._mean - self._mean
+            self._m2 += other._m2 + delta * delta * (
+                    self._duration * other._duration / duration)
+            self._mean += delta * other._duration / duration
+            self._duration = duration
+        if self._occupancy is not None:
+            if other._occupancy is None:
+                raise ValueError('pmf is not tracked')
+            for value, dt in other._occupancy.items():
+                self._occupancy[value] = self._occupancy.get(value, 0.) + dt
+        self._count += other._count
+
+    def state(self):
+        return {'count': self._count, 'time': self._time,
+                'value': self._value, 'duration': self._duration,
+                'mean': self._mean, 'm2': self._m2,
+                'occupancy': None if self._occupancy is None else
+                dict(self._occupancy)}
+
+    @classmethod
+    def from_state(cls, state):
+        avg = cls(state['occupancy'] is not None)
+        avg._count, avg._time, avg._value = \
+            state['count'], state['time'], state['value']
+        avg._duration, avg._mean, avg._m2 = \
+            state['duration'], state['mean'], state['m2']
+        if state['occupancy'] is not None:
+            avg._occupancy = dict(state['occupancy'])
+        return avg
+
+    def reset(self, t=None):
+        """Forget accumulated values. If `t` is given, the last recorded
+        value is kept as the value at time `t`.
+        """
+        value = self._value
+        self.__init__(self._occupancy is not None)
+        if t is not None and value is not None:
+            self.record(t, value)
 
 
 class Intervals:
-    def __init__(self, timestamps=None):
-        if timestamps:
-            _timestamps = [0] + list(timestamps)
-            try:
-                _zipped = zip(_timestamps[:-1], _timestamps[1:])
-                if any(x > y for x, y in _zipped):
-                    raise ValueError('timestamps must be ascending')
-            except TypeError as e:
-                raise TypeError('only numeric values expected') from e
-            self._timestamps = [0] + list(timestamps)
-        else:
-            self._timestamps = [0]
+    """Intervals between ascending timestamps, starting from zero.
+
+    Timestamps are stored in a growable float array, on disk with
+    `storage='disk'` (see `Statistic`). Then `statistic()` and `as_array()`
+    spill the intervals to a temporary file too. With `store=False` only the last
+    timestamp is kept, and intervals are fed into a streaming `Statistic`
+    returned by `statistic()`.
+    """
+    def __init__(self, timestamps=None, store=True, storage='memory'):
+        self._storage = storage
+        self._last = 0.  # the last timestamp, cached in both modes
+        if store:
+            self._timestamps = _new_buffer(storage)
+            self._timestamps.append(0)
+            self._intervals = None
+        else:
+            self._timestamps = None
+            self._intervals = Statistic(store=False)
+        if timestamps is not None:
+            timestamps = self._as_array(timestamps)
+            if len(timestamps) and (timestamps[0] < 0 or
+                                    np.any(np.diff(timestamps) < 0)):
+                raise ValueError('timestamps must be ascending')
+            self.extend(timestamps)
+
+    @property
+    def store(self):
+        return self._intervals is None
 
     @property
     def last(self):
-        return self._timestamps[-1]
+        return self._last
 
     @property
     def empty(self):
-        return len(self._timestamps) == 1
+        return len(self) == 0
 
     def __len__(self):
+        if self._timestamps is None:
+            return len(self._intervals)
         return len(self._timestamps) - 1
 
     def record(self, timestamp):
         try:
-            if timestamp < self.last:
+            if timestamp < self._last:
                 raise ValueError('prohibited timestamps from past')
         except TypeError as e:
             raise TypeError('only numeric values expected') from e
-        self._timestamps.append(timestamp)
+        if self._timestamps is None:
+            self._intervals.append(timestamp - self._last)
+        else:
+            self._timestamps.append(timestamp)
+        self._last = timestamp
+
+    @staticmethod
+    def _as_array(timestamps):
+        if isinstance(timestamps, np.ndarray):
+            if timestamps.ndim != 1:
+                raise ValueError('wrong data shape')
+        else:
+            timestamps = list(timestamps)
+        try:
+            array = np.asarray(timestamps)
+        except ValueError as e:
+            raise TypeError('only numeric values expected') from e
+        if array.ndim != 1 or array.dtype.kind not in 'biuf':
+            raise TypeError('only numeric values expected')
+        return array.astype(float, copy=False)
+
+    def extend(self, timestamps):
+        """Record ascending timestamps given as an array."""
+        timestamps = self._as_array(timestamps)
+        if len(timestamps) == 0:
+            return
+        if timestamps[0] < self._last:
+            raise ValueError('prohibited timestamps from past')
+        if np.any(np.diff(timestamps) < 0):
+            raise ValueError('timestamps must be ascending')
+        if self._timestamps is None:
+            self._intervals.extend(np.diff(timestamps, prepend=self._last))
+        else:
+            self._timestamps.extend(timestamps)
+        self._last = float(timestamps[-1])
+
+    def reset(self):
+        # The last timestamp is kept, so the next interval is measured from it:
+        if self._timestamps is None:
+            self._intervals = Statistic(store=False)
+        else:
+            self._timestamps = _new_buffer(self._storage)
+            self._timestamps.append(self._last)
 
     def statistic(self):
-        return Statistic(self.as_tuple())
+        """Get intervals as a `Statistic`. For streaming intervals, this is
+        the statistic intervals are fed into, not a copy.
+        """
+        if self._timestamps is None:
+            return self._intervals
+        st = Statistic(storage=self._storage)
+        if self._storage == 'memory':
+            st._data = _Buffer.wrap(np.diff(self._timestamps.view()))
+        else:
+            # Spilled chunk by chunk, so intervals are never all in memory:
+            for chunk in self._timestamps.chunks(overlap=1):
+                st._data.extend(np.diff(chunk))
+        return st
+
+    def state(self):
+        if self._timestamps is None:
+            return {'last': self._last, 'statistic': self._intervals.state()}
+        return {'timestamps': self._timestamps.view()}
+
+    @classmethod
+    def from_state(cls, state):
+        if 'timestamps' in state:
+            ints = cls()
+            ints._timestamps = _Buffer.wrap(
+                np.asarray(state['timestamps'], dtype=float))
+            ints._last = float(ints._timestamps.last())
+        else:
+            ints = cls(store=False)
+            ints._last = state['last']
+            ints._intervals = Statistic.from_state(state['statistic'])
+        return ints
+
+    def save(self, path):
+        """Save to directory `path`, see `Statistic.save()`."""
+        _save(self, path)
+
+    @classmethod
+    def load(cls, path):
+        return _load(path, cls)
+
+    def as_array(self):
+        if self._timestamps is None:
+            raise ValueError('intervals are not stored')
+        if self._storage == 'memory':
+            return np.diff(self._timestamps.view())
+        return self.statistic().asarray()
 
     def as_tuple(self):
-        ar = np.asarray(self._timestamps)
-        return tuple(ar[1:] - ar[:-1])
+        return tuple(self.as_array().tolist())
 
     def as_list(self):
-        return list(self.as_tuple())
+        return self.as_array().tolist()
+
+
+class Histogram:
+    """Counts of samples in fixed bins, O(1) memory and time per sample.
+
+    Bins split `[low, high)` into `num_bins` equal parts (`scale='linear'`)
+    or parts of equal ratio (`scale='log'`, requires `low > 0`). Samples
+    outside the range are counted in `underflow` and `overflow`. Histograms
+    with the same bins can be merged.
+    """
+    def __init__(self, low, high, num_bins=100, scale='linear'):
+        if not high > low:
+            raise ValueError('high must be greater than low')
+        if num_bins < 1 or int(num_bins) != num_bins:
+            raise ValueError('positive integer number of bins expected')
+        num_bins = int(num_bins)
+        if scale == 'linear':
+            self.edges = np.linspace(low, high, num_bins + 1)
+            self._origin = low
+        elif scale == 'log':
+            if low <= 0:
+                raise ValueError('log scale requires positive low')
+            self.edges = np.geomspace(low, high, num_bins + 1)
+            self._origin = math.log(low)
+        else:
+            raise ValueError('invalid scale')
+        self.scale = scale
+        self._low, self._high = low, high
+        self._edges = self.edges.tolist()  # for fast scalar comparisons
+        self._factor = num_bins / (
+            high - low if scale == 'linear' else math.log(high / low))
+        # Underflow is counted at index 0, overflow at the last index:
+        self._counts = np.zeros(num_bins + 2, dtype=np.int64)
+        self._moments = _Moments()
+
+    @property
+    def num_bins(self):
+        return len(self._counts) - 2
+
+    @property
+    def counts(self):
+        return self._counts[1:-1]
+
+    @property
+    def underflow(self):
+        return int(self._counts[0])
+
+    @property
+    def overflow(self):
+        return int(self._counts[-1])
+
+    def __len__(self):
+        return self._moments.n
+
+    def _index(self, value):
+        if value < self._low:
+            return 0
+        if value >= self._high:
+            return len(self._counts) - 1
+        x = value if self.scale == 'linear' else math.log(value)
+        index = min(int((x - self._origin) * self._factor), self.num_bins - 1)
+        # The computed index may be off by one at bin edges due to rounding,
+        # so it is corrected against `edges`, like `np.histogram` bins:
+        if value < self._edges[index]:
+            index -= 1
+        elif value >= self._edges[index + 1]:
+            index += 1
+        return index + 1
+
+    def append(self, value):
+        self._counts[self._index(value)] += 1
+        self._moments.add(value)
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=float).ravel()
+        if len(values) == 0:
+            return
+        # Indices in `_counts`, with 0 for underflow and the last for
+        # overflow:
+        indices = np.searchsorted(self.edges, values, side='right')
+        self._counts += np.bincount(indices, minlength=len(self._counts))
+        self._moments.merge(_Moments.of(values))
+
+    def merge(self, other):
+        if self.scale != other.scale or \
+                not np.array_equal(self.edges, other.edges):
+            raise ValueError('histograms have different bins')
+        self._counts += other._counts
+        self._moments.merge(other._moments)
+
+    def state(self):
+        return {'low': self._low, 'high': self._high,
+                'num_bins': self.num_bins, 'scale': self.scale,
+                'counts': self._counts.copy(),
+                'moments': self._moments.state()}
+
+    @classmethod
+    def from_state(cls, state):
+        hist = cls(state['low'], state['high'], state['num_bins'],
+                   state['scale'])
+        hist._counts[:] = state['counts']
+        hist._moments = _Moments(*state['moments'])
+        return hist
+
+    def reset(self):
+        self._counts[:] = 0
+        self._moments = _Moments()
+
+    def mean(self):
+        if self._moments.n == 0:
+            raise ValueError('no samples')
+        return self._moments.mean
+
+    def std(self):
+        return math.sqrt(self.var())
+
+    def var(self):
+        if self._moments.n == 0:
+            raise ValueError('no samples')
+        return self._moments.m2 / self._moments.n
+
+    def density(self):
+        """Density estimate in each bin, normalized by all samples including
+        those outside the range."""
+        if self._moments.n == 0:
+            raise ValueError('no samples')
+        return self.counts / (self._moments.n * np.diff(self.edges))
+
+    def cdf(self):
+        """Fractions of samples below each bin edge."""
+        if self._moments.n == 0:
+            raise ValueError('no samples')
+        return np.cumsum(self._counts[:-1]) / self._moments.n
+
+
+class P2Quantile:
+    """Streaming estimate of a single quantile with the P-square algorithm
+    (Jain and Chlamtac, 1985) in O(1) memory.
+
+    Five markers track the minimum, maximum, the quantile `p` and two
+    quantiles around it. Marker heights are adjusted with piecewise-parabolic
+    interpolation. Estimates cannot be merged, use `TDigest` for that.
+    """
+    def __init__(self, p):
+        if not 0 < p < 1:
+            raise ValueError('quantile must be in (0, 1)')
+        self.p = p
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def append(self, value):
+        self._count += 1
+        q, n = self._heights, self._positions
+        if self._count <= 5:
+            bisect.insort(q, value)
+            return
+        if value < q[0]:
+            q[0] = value
+            k = 0
+        elif value >= q[4]:
+            q[4] = value
+            k = 3
+        else:
+            k = bisect.bisect_right(q, value) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+        for i in range(1, 4):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or \
+                    (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                height = q[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) /
+                    (n[i + 1] - n[i]) +
+                    (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) /
+                    (n[i] - n[i - 1]))
+                if not q[i - 1] < height < q[i + 1]:
+                    height = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                q[i] = height
+                n[i] += d
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def value(self):
+        if self._count == 0:
+            raise ValueError('no samples')
+        if self._count <= 5:
+            return float(np.quantile(self._heights, self.p))
+        return self._heights[2]
+
+    def state(self):
+        return {'p': self.p, 'heights': list(self._heights),
+                'positions': list(self._positions),
+                'desired': list(self._desired), 'count': self._count}
+
+    @classmethod
+    def from_state(cls, state):
+        estimate = cls(state['p'])
+        estimate._heights = list(state['heights'])
+        estimate._positions = list(state['positions'])
+        estimate._desired = list(state['desired'])
+        estimate._count = state['count']
+        return estimate
+
+    def reset(self):
+        self.__init__(self.p)
+
+
+class TDigest:
+    """Mergeable streaming estimate of arbitrary quantiles (Dunning's merging
+    t-digest).
+
+    Samples are buffered and periodically merged into at most about
+    `compression` weighted centroids. Centroids are small near the tails, so
+    extreme quantiles like p99.9 stay accurate. Digests of different
+    replications can be combined with `merge()`.
+    """
+    def __init__(self, compression=100):
+        if compression < 10:
+            raise ValueError('compression must be at least 10')
+        self.compression = compression
+        self._means = np.empty(0)
+        self._weights = np.empty(0)
+        self._buffer = []
+        self._buffer_size = 5 * compression
+        self._min, self._max = math.inf, -math.inf
+
+    def __len__(self):
+        return int(self._weights.sum()) + len(self._buffer)
+
+    def reset(self):
+        self.__init__(self.compression)
+
+    def append(self, value):
+        self._buffer.append(float(value))
+        if len(self._buffer) >= self._buffer_size:
+            self._compress()
+
+    def extend(self, values):
+        # Merged in slices of the buffer size, so memory does not grow with
+        # the number of values:
+        values = np.asarray(values, dtype=float).ravel()
+        for start in range(0, len(values), self._buffer_size):
+            part = values[start:start + self._buffer_size]
+            self._compress(part, np.ones(len(part)))
+
+    def merge(self, other):
+        other._compress()
+        self._compress(other._means, other._weights)
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+
+    def state(self):
+        self._compress()
+        return {'compression': self.compression, 'means': self._means.copy(),
+                'weights': self._weights.copy(), 'min': self._min,
+                'max': self._max}
+
+    @classmethod
+    def from_state(cls, state):
+        digest = cls(state['compression'])
+        digest._means = np.array(state['means'], dtype=float)
+        digest._weights = np.array(state['weights'], dtype=float)
+        digest._min, digest._max = state['min'], state['max']
+        return digest
+
+    def _q_limit(self, q, total):
+        # Inverse of the scale function k(q) = compression * log(q/(1-q)) / z
+        # at k(q) + 1, so every centroid spans at most one unit of k:
+        if q <= 0:
+            return 0.
+        if q >= 1:
+            return 1.
+        z = 4 * math.log(max(total / self.compression, 1.)) + 24
+        return 1 / (1 + (1 - q) / q * math.exp(-z / self.compression))
+
+    def _compress(self, means=None, weights=None):
+        parts_m, parts_w = [self._means], [self._weights]
+        if self._buffer:
+            parts_m.append(np.asarray(self._buffer))
+            parts_w.append(np.ones(len(self._buffer)))
+            self._buffer = []
+        if means is not None:
+            parts_m.append(means)
+            parts_w.append(weights)
+        means, weights = np.concatenate(parts_m), np.concatenate(parts_w)
+        if len(means) == 0:
+            return
+        self._min = min(self._min, means.min())
+        self._max = max(self._max, means.max())
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order].tolist(), weights[order].tolist()
+        total = sum(weights)
+
+        new_means, new_weights = [], []
+        mean, weight, merged = means[0], weights[0], 0.
+        limit = 0.
+        for m, w in zip(means[1:], weights[1:]):
+            if merged + weight + w <= limit:
+                weight += w
+                mean += (m - mean) * w / weight
+            else:
+                new_means.append(mean)
+                new_weights.append(weight)
+                merged += weight
+                limit = total * self._q_limit(merged / total, total)
+                mean, weight = m, w
+        new_means.append(mean)
+        new_weights.append(weight)
+        self._means, self._weights = np.array(new_means), np.array(new_weights)
+
+    def _knots(self):
+        # Centroid means placed at the middle of their cumulative weight,
+        # with exact minimum and maximum at the ends:
+        self._compress()
+        if len(self._weights) == 0:
+            raise ValueError('no samples')
+        cumulative = np.cumsum(self._weights) - self._weights / 2
+        positions = np.concatenate(([0.], cumulative, [self._weights.sum()]))
+        values = np.concatenate(([self._min], self._means, [self._max]))
+        return positions, values
+
+    def quantile(self, q):
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError('quantile must be in [0, 1]')
+        positions, values = self._knots()
+        result = np.interp(q * positions[-1], positions, values)
+        return float(result) if result.ndim == 0 else result
+
+    def cdf(self, x):
+        positions, values = self._knots()
+        result = np.interp(x, values, positions) / positions[-1]
+        return float(result) if result.ndim == 0 else result
+
+
+def _reset_statistic(stat, t):
+    if isinstance(stat, (Trace, TimeAverage)):
+        stat.reset(t)
+    else:
+        stat.reset()
+
+
+def _summarize(stat):
+    # Scalar summaries of a statistic, NaN if not defined (e.g., no samples):
+    def get(fn):
+        try:
+            return float(fn())
+        except (ValueError, ZeroDivisionError, FloatingPointError):
+            return math.nan
+
+    if isinstance(stat, (Statistic, Histogram)):
+        return {'count': len(stat), 'mean': get(stat.mean),
+                'std': get(stat.std)}
+    if isinstance(stat, Trace):
+        return {'count': len(stat), 'timeavg': get(stat.timeavg)}
+    if isinstance(stat, TimeAverage):
+        return {'count': len(stat), 'timeavg': get(stat.timeavg),
+                'std': get(stat.std)}
+    if isinstance(stat, Intervals):
+        return {'count': len(stat), 'mean': get(stat.statistic().mean),
+                'std': get(stat.statistic().std)}
+    if isinstance(stat, TDigest):
+        return {'count': len(stat), 'p50': get(lambda: stat.quantile(0.5)),
+                'p99': get(lambda: stat.quantile(0.99))}
+    return {'count': len(stat), 'value': get(stat.value)}
+
+
+class StatisticsRegistry:
+    """Named statistics of a simulation, available as `sim.stats`.
+
+    Models get statistics by name, e.g. `sim.stats.statistic('server.delay')`
+    creates a `Statistic` on the first call and returns the same one later.
+    Names are dot-separated, like `Model.path`. The registry resets all
+    statistics at once (also on warm-up end), and gives flat `summary()`
+    values and compact `state()`, so sweeps can extract only them.
+    """
+    _KINDS = {cls.__name__: cls for cls in (
+        Statistic, Trace, Intervals, TimeAverage, Histogram, P2Quantile,
+        TDigest)}
+
+    def __init__(self):
+        self._items = {}
+
+    def _get(self, name, cls, *args, **kwargs):
+        try:
+            stat = self._items[name]
+        except KeyError:
+            stat = self._items[name] = cls(*args, **kwargs)
+            return stat
+        if type(stat) is not cls:
+            raise ValueError(f'{name} is registered as {type(stat).__name__}')
+        return stat
+
+    def statistic(self, name, **kwargs):
+        return self._get(name, Statistic, **kwargs)
+
+    def trace(self, name, **kwargs):
+        return self._get(name, Trace, **kwargs)
+
+    def intervals(self, name, **kwargs):
+        return self._get(name, Intervals, **kwargs)
+
+    def time_average(self, name, **kwargs):
+        return self._get(name, TimeAverage, **kwargs)
+
+    def histogram(self, name, low, high, num_bins=100, scale='linear'):
+        return self._get(name, Histogram, low, high, num_bins, scale)
+
+    def p2_quantile(self, name, p):
+        return self._get(name, P2Quantile, p)
+
+    def tdigest(self, name, compression=100):
+        return self._get(name, TDigest, compression)
+
+    def add(self, name, stat):
+        """Register an existing statistic under the given name."""
+        if type(stat).__name__ not in self._KINDS:
+            raise TypeError('statistic expected')
+        if self._items.get(name, stat) is not stat:
+            raise ValueError(f'{name} is already registered')
+        self._items[name] = stat
+        return stat
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+    def __contains__(self, name):
+        return name in self._items
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def items(self):
+        return self._items.items()
+
+    def reset(self, t=None):
+        """Reset all statistics. Traces and time averages keep their last
+        values at time `t`, if given.
+        """
+        for stat in self._items.values():
+            _reset_statistic(stat, t)
+
+    def summary(self, structured=False):
+        """Get scalar summaries as a flat dict with keys like
+        `'server.delay.mean'`, or as a numpy structured array with a single
+        record and the same field names if `structured` is true.
+        """
+        summary = {f'{name}.{key}': value
+                   for name, stat in self._items.items()
+                   for key, value in _summarize(stat).items()}
+        if not structured:
+            return summary
+        dtype = [(key, np.int64 if key.endswith('.count') else float)
+                 for key in summary]
+        return np.array([tuple(summary.values())], dtype=dtype)
+
+    def state(self):
+        """Get states of all statistics, see `from_state()`."""
+        return {name: (type(stat).__name__, stat.state())
+                for name, stat in self._items.items()}
+
+    @classmethod
+    def from_state(cls, state):
+        registry = cls()
+        for name, (kind, stat_state) in state.items():
+            registry._items[name] = cls._KINDS[kind].from_state(stat_state)
+        return registry
+
+    def save(self, path):
+        """Save all statistics into subdirectories of `path` named after
+        them, see `Statistic.save()`.
+        """
+        names = list(self._items)
+        os.makedirs(path, exist_ok=True)
+        for name in names:
+            _save(self._items[name], os.path.join(path, name))
+        with open(os.path.join(path, 'registry.pkl'), 'wb') as f:
+            pickle.dump(names, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(os.path.join(path, 'registry.pkl'), 'rb') as f:
+            names = pickle.load(f)
+        registry = cls()
+        for name in names:
+            registry._items[name] = _load(os.path.join(path, name))
+        return registry
+
+
+#
+# Saving statistics: a statistic is saved into a directory, where arrays of
+# its state go to separate `.npy` files and the rest of the state is pickled
+# into `state.pkl`. Arrays are memory-mapped on loading, so opening large
+# results is fast and only used arrays are read.
+#
+def _save(stat, path):
+    state = stat.state()
+    arrays = [key for key, value in state.items()
+              if isinstance(value, np.ndarray)]
+    os.makedirs(path, exist_ok=True)
+    for key in arrays:
+        np.save(os.path.join(path, f'{key}.npy'), state.pop(key))
+    with open(os.path.join(path, 'state.pkl'), 'wb') as f:
+        pickle.dump((type(stat).__name__, state, arrays), f)
+
+
+def _load(path, cls=None):
+    with open(os.path.join(path, 'state.pkl'), 'rb') as f:
+        kind, state, arrays = pickle.load(f)
+    if cls is None:
+        cls = StatisticsRegistry._KINDS[kind]
+    elif kind != cls.__name__:
+        raise ValueError(f'{kind} saved, not {cls.__name__}')
+    for key in arrays:
+        state[key] = np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r')
+    return cls.from_state(state)
+
+
+#
+# Transfer of large statistics from worker processes. Instead of pickling
+# samples, a worker writes them into a temporary `.npy` file (in `/dev/shm`
+# when available, so the data stays in RAM) and pickles only the file name.
+# The receiving process memory-maps the file and unlinks it at once, so the
+# statistic is backed by a zero-copy read-only array, which is copied on
+# the first modification.
+#
+TRANSFER_THRESHOLD = 1 << 16
+
+_TRANSFER_FIELDS = {
+    Statistic: '_data',
+    Trace: '_data',
+    Intervals: '_timestamps',
+}
+
+
+def _transfer_dir():
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+def _reduce_for_transfer(obj):
+    field = _TRANSFER_FIELDS[type(obj)]
+    state = dict(obj.__dict__)
+    data = state.pop(field)
+    if data is None or data.view().nbytes < TRANSFER_THRESHOLD:
+        return obj.__reduce_ex__(4)
+    path = os.path.join(_transfer_dir(), f'pydesim-{uuid.uuid4().hex}.npy')
+    np.save(path, data.view())
+    return _rebuild_transferred, (type(obj), field, path, state)
+
+
+def _rebuild_transferred(cls, field, path, state):
+    array = np.load(path, mmap_mode='r')
+    try:
+        os.unlink(path)
+    except OSError:
+        pass  # Windows does not allow removing memory-mapped files
+    obj = cls.__new__(cls)
+    obj.__dict__.update(state)
+    setattr(obj, field, _Buffer.wrap(array))
+    return obj
+
+
+def register_transfer(pickler):
+    """Make `pickler` transfer large statistics via memory-mapped files.
+
+    `pickler` is expected to be `multiprocessing.reduction.ForkingPickler`
+    (or a class with the same `register()` method). This is called in the
+    pool workers started by `simulate()`.
+    """
+    for cls in _TRANSFER_FIELDS:
+        pickler.register(cls, _reduce_for_transfer)
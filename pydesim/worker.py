@@ -0,0 +1,47 @@
+"""Worker of distributed simulations, see `pydesim.distributed`.
+
+Usage: python -m pydesim.worker --connect HOST:PORT --authkey KEY
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+
+from .distributed import run_worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m pydesim.worker',
+        description='Run simulations served by a pydesim coordinator.')
+    parser.add_argument('--connect', required=True, metavar='HOST:PORT',
+                        help='coordinator address')
+    parser.add_argument('--authkey', default=os.environ.get('PYDESIM_AUTHKEY'),
+                        help='coordinator secret key (default: '
+                             '$PYDESIM_AUTHKEY)')
+    parser.add_argument('--processes', type=int, default=1,
+                        help='number of worker processes (default: 1)')
+    parser.add_argument('--heartbeat', type=float, default=1.0,
+                        help='heartbeat interval in seconds (default: 1)')
+    parser.add_argument('--path', action='append', default=[],
+                        help='add a directory to sys.path to import models')
+    args = parser.parse_args(argv)
+
+    if not args.authkey:
+        parser.error('authkey required')
+    host, _, port = args.connect.rpartition(':')
+    address, authkey = (host, int(port)), args.authkey.encode()
+    sys.path[:0] = args.path
+
+    workers = [multiprocessing.Process(
+        target=run_worker, args=(address, authkey, args.heartbeat))
+        for _ in range(args.processes - 1)]
+    for worker in workers:
+        worker.start()
+    run_worker(address, authkey, args.heartbeat)
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == '__main__':
+    main()
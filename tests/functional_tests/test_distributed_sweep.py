@@ -0,0 +1,62 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+from pydesim import simulate, Coordinator, Precision
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))))
+
+
+class Samples(list):
+    def __init__(self, mean):
+        super().__init__()
+
+
+def draw_exponentials(sim):
+    sim.data.extend(np.random.exponential(sim.params.mean, 100))
+
+
+def sample_mean(sim):
+    return float(np.mean(sim.data))
+
+
+def fail(sim):
+    raise RuntimeError('model error')
+
+
+@pytest.fixture
+def coordinator():
+    with Coordinator(authkey=b'test-key') as coordinator:
+        host, port = coordinator.address
+        workers = [subprocess.Popen(
+            [sys.executable, '-m', 'pydesim.worker',
+             '--connect', f'{host}:{port}', '--authkey', 'test-key'],
+            cwd=ROOT_DIR) for _ in range(2)]
+        yield coordinator
+    for worker in workers:
+        worker.wait(timeout=10)
+
+
+def test_sweep_on_localhost_workers(coordinator):
+    points = [{'mean': mean} for mean in (1, 10, 100, 1000)]
+    ret = simulate(Samples, init=draw_exponentials, params=points,
+                   extract=sample_mean, coordinator=coordinator)
+    assert len(ret) == 4
+    assert ret == sorted(ret)
+
+    est = simulate(Samples, init=draw_exponentials, params={'mean': 1},
+                   extract=sample_mean, coordinator=coordinator,
+                   precision=Precision(rel_tol=0.1))
+    assert est.converged
+    assert len(set(est.values)) == len(est)
+
+
+def test_worker_errors_are_reported(coordinator):
+    with pytest.raises(RuntimeError) as excinfo:
+        simulate(Samples, init=fail, params={'mean': 1}, extract=sample_mean,
+                 coordinator=coordinator)
+    assert 'model error' in str(excinfo.value)
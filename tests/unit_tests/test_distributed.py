@@ -0,0 +1,70 @@
+import pytest
+
+from pydesim import Coordinator
+from pydesim.distributed import _TaskBoard
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+def test_coordinator_requires_authkey():
+    with pytest.raises(ValueError) as excinfo:
+        Coordinator()
+    assert 'authkey required' in str(excinfo.value).lower()
+
+
+def test_board_serves_tasks_in_order_and_returns_results():
+    board = _TaskBoard()
+    worker = board.register()
+    tids = board.submit([b'first', b'second'])
+
+    assert board.get_task(worker) == (tids[0], b'first')
+    board.put_result(worker, tids[0], True, b'result')
+    assert board.wait(tids) == {tids[0]: (True, b'result')}
+    assert board.get_task(worker) == (tids[1], b'second')
+
+
+def test_board_lets_idle_worker_steal_running_task():
+    board = _TaskBoard(max_copies=2)
+    worker1, worker2, worker3 = [board.register() for _ in range(3)]
+    tid = board.submit([b'task'])[0]
+
+    assert board.get_task(worker1) == (tid, b'task')
+    assert board.get_task(worker2) == (tid, b'task')
+    assert board.get_task(worker3) is None  # two copies already running
+
+    board.put_result(worker2, tid, True, b'second')
+    board.put_result(worker1, tid, True, b'first')  # ignored, came late
+    assert board.wait([tid]) == {tid: (True, b'second')}
+
+
+def test_board_redispatches_tasks_of_lost_workers():
+    clock = FakeClock()
+    board = _TaskBoard(heartbeat_timeout=10, max_copies=1, clock=clock)
+    worker1, worker2 = board.register(), board.register()
+    tid = board.submit([b'task'])[0]
+    assert board.get_task(worker1) == (tid, b'task')
+    assert board.get_task(worker2) is None
+
+    clock.time = 5
+    board.heartbeat(worker1)
+    clock.time = 12
+    assert board.get_task(worker2) is None  # worker1 is still alive
+
+    clock.time = 16
+    assert board.get_task(worker2) == (tid, b'task')
+    assert board.num_workers() == 1
+
+
+def test_closed_board_serves_no_tasks():
+    board = _TaskBoard()
+    worker = board.register()
+    board.submit([b'task'])
+    board.close()
+    assert board.closed()
+    assert board.get_task(worker) is None
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from pydesim import Histogram
+
+
+def test_histogram_counts_samples_in_linear_bins():
+    hist = Histogram(0, 10, num_bins=5)
+    for value in (-1, 0, 1.9, 2, 5, 9.99, 10, 12):
+        hist.append(value)
+    np.testing.assert_array_equal(hist.edges, [0, 2, 4, 6, 8, 10])
+    np.testing.assert_array_equal(hist.counts, [2, 1, 1, 0, 1])
+    assert hist.underflow == 1
+    assert hist.overflow == 2
+    assert len(hist) == 8
+    assert hist.mean() == pytest.approx(np.mean([-1, 0, 1.9, 2, 5, 9.99, 10,
+                                                 12]))
+
+
+@pytest.mark.parametrize('scale', ['linear', 'log'])
+def test_histogram_extend_matches_append(scale):
+    samples = np.random.default_rng(0).exponential(1.0, 10000)
+    one, bulk = Histogram(0.01, 5, 30, scale), Histogram(0.01, 5, 30, scale)
+    for value in samples:
+        one.append(value)
+    bulk.extend(samples)
+    np.testing.assert_array_equal(one.counts, bulk.counts)
+    assert (one.underflow, one.overflow) == (bulk.underflow, bulk.overflow)
+    assert one.var() == pytest.approx(bulk.var())
+    np.testing.assert_array_equal(
+        bulk.counts, np.histogram(samples, bulk.edges)[0])
+
+
+@pytest.mark.parametrize('low, high, num_bins, scale', [
+    (0, 1, 10, 'linear'),
+    (1e-3, 1e3, 60, 'log'),
+])
+def test_histogram_counts_values_on_edges_in_upper_bins(low, high, num_bins,
+                                                       scale):
+    one, bulk = Histogram(low, high, num_bins, scale), \
+        Histogram(low, high, num_bins, scale)
+    values = one.edges[:-1]
+    for value in values:
+        one.append(value)
+    bulk.extend(values)
+    np.testing.assert_array_equal(one.counts, np.ones(num_bins))
+    np.testing.assert_array_equal(bulk.counts, np.ones(num_bins))
+    np.testing.assert_allclose(bulk.cdf(), np.arange(num_bins + 1) / num_bins)
+    hist = Histogram(0, 1, 10)
+    hist.append(0.3)
+    assert hist.counts[2] == np.histogram([0.3], hist.edges)[0][2] == 1
+
+
+def test_histogram_log_bins():
+    hist = Histogram(1, 1000, num_bins=3, scale='log')
+    np.testing.assert_allclose(hist.edges, [1, 10, 100, 1000])
+    hist.extend([1, 5, 50, 500, 999])
+    np.testing.assert_array_equal(hist.counts, [2, 1, 2])
+
+
+def test_histogram_density_and_cdf():
+    samples = np.random.default_rng(1).uniform(0, 4, 100000)
+    hist = Histogram(0, 2, num_bins=4)
+    hist.extend(samples)
+    np.testing.assert_allclose(hist.density(), 0.25, rtol=0.03)
+    np.testing.assert_allclose(hist.cdf(), [0, 0.125, 0.25, 0.375, 0.5],
+                               atol=0.01)
+
+
+def test_histogram_merge():
+    rng = np.random.default_rng(2)
+    a, b = rng.normal(0, 1, 1000), rng.normal(1, 1, 2000)
+    merged, other = Histogram(-3, 3, 12), Histogram(-3, 3, 12)
+    merged.extend(a)
+    other.extend(b)
+    merged.merge(other)
+    total = Histogram(-3, 3, 12)
+    total.extend(np.concatenate((a, b)))
+    np.testing.assert_array_equal(merged.counts, total.counts)
+    assert merged.mean() == pytest.approx(total.mean())
+    with pytest.raises(ValueError) as excinfo:
+        merged.merge(Histogram(-3, 3, 10))
+    assert 'different bins' in str(excinfo.value).lower()
+
+
+def test_histogram_with_invalid_arguments_raises_error():
+    with pytest.raises(ValueError):
+        Histogram(1, 1)
+    with pytest.raises(ValueError):
+        Histogram(0, 1, scale='log')
+    with pytest.raises(ValueError):
+        Histogram(0, 1, scale='wrong')
+
+
+def test_histogram_state():
+    hist = Histogram(1, 100, 10, scale='log')
+    hist.extend([0.5, 2, 50, 200])
+    restored = Histogram.from_state(hist.state())
+    np.testing.assert_array_equal(restored.counts, hist.counts)
+    assert (restored.underflow, restored.overflow) == (1, 1)
+    assert restored.mean() == hist.mean()
+    restored.merge(hist)
+    assert len(restored) == 8
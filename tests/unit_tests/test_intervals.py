@@ -1,5 +1,6 @@
 import pytest
-from numpy import asarray
+from numpy import asarray, cumsum, diff, memmap, zeros
+from numpy.random import default_rng
 from numpy.testing import assert_almost_equal
 
 from pydesim import Intervals
@@ -26,6 +27,17 @@ def test_intervals_creation_with_valid_data(timestamps):
     assert ints.last == timestamps[-1]
 
 
+@pytest.mark.parametrize('store', [True, False])
+def test_intervals_creation_from_array(store):
+    ints = Intervals(asarray([1, 3, 6]), store=store)
+    assert len(ints) == 3
+    assert ints.last == 6
+    assert_almost_equal(ints.statistic().mean(), 2)
+    with pytest.raises(ValueError) as excinfo:
+        Intervals(asarray([-1, 3]), store=store)
+    assert 'timestamps must be ascending' in str(excinfo.value).lower()
+
+
 def test_intervals_copy_list_content_instead_of_pointer():
     data = [1, 2]
     ints = Intervals(data)
@@ -98,3 +110,92 @@ def test_statistic(data):
     ints = Intervals(data)
     stats = ints.statistic()
     assert_almost_equal(stats.as_tuple(), ints.as_tuple())
+
+
+def test_reset_keeps_last_timestamp():
+    ints = Intervals([1, 3])
+    ints.reset()
+    assert ints.empty
+    assert ints.last == 3
+    ints.record(4)
+    assert ints.as_tuple() == (1,)
+
+
+def test_disk_storage():
+    ints = Intervals([1, 3], storage='disk')
+    ints.record(6)
+    assert ints.as_tuple() == (1, 2, 3)
+    assert ints.last == 6
+    ints.reset()
+    ints.record(7)
+    assert ints.as_tuple() == (1,)
+
+
+def test_disk_storage_spills_intervals_to_disk():
+    timestamps = cumsum(default_rng(0).exponential(1, 200000))
+    ints = Intervals(timestamps, storage='disk')
+    st = ints.statistic()
+    assert st._data.path != ints._timestamps.path
+    assert isinstance(ints.as_array(), memmap)
+    assert_almost_equal(ints.as_array(), diff(timestamps, prepend=0))
+    assert_almost_equal(st.mean(), timestamps[-1] / len(timestamps))
+    assert_almost_equal(st.std(), diff(timestamps, prepend=0).std())
+
+
+def test_as_array():
+    ints = Intervals([1, 3, 6])
+    assert_almost_equal(ints.as_array(), [1, 2, 3])
+    stats = ints.statistic()
+    stats.append(10)
+    assert ints.as_tuple() == (1, 2, 3)
+
+
+def test_streaming_intervals_feed_statistic():
+    ints = Intervals([1, 3], store=False)
+    ints.record(6)
+    assert not ints.store
+    assert len(ints) == 3
+    assert ints.last == 6
+    stats = ints.statistic()
+    assert not stats.store
+    assert stats.mean() == 2
+    with pytest.raises(ValueError) as excinfo:
+        ints.as_tuple()
+    assert 'not stored' in str(excinfo.value).lower()
+
+    ints.reset()
+    assert ints.empty
+    ints.record(10)
+    assert ints.statistic().mean() == 4
+    with pytest.raises(ValueError):
+        ints.record(9)
+
+
+@pytest.mark.parametrize('store', [True, False])
+def test_save_and_load(tmp_path, store):
+    Intervals([1, 3, 6], store=store).save(tmp_path / 'ints')
+    loaded = Intervals.load(tmp_path / 'ints')
+    assert len(loaded) == 3
+    assert loaded.last == 6
+    assert loaded.statistic().mean() == 2
+
+
+@pytest.mark.parametrize('store', [True, False])
+def test_extend(store):
+    ints = Intervals([1], store=store)
+    ints.extend(asarray([3, 6, 6]))
+    assert len(ints) == 4
+    assert ints.last == 6
+    assert_almost_equal(ints.statistic().mean(), 1.5)
+    with pytest.raises(ValueError) as excinfo:
+        ints.extend([5])
+    assert 'prohibited timestamps from past' in str(excinfo.value).lower()
+    with pytest.raises(ValueError) as excinfo:
+        ints.extend([8, 7])
+    assert 'timestamps must be ascending' in str(excinfo.value).lower()
+    with pytest.raises(TypeError):
+        ints.extend(['hello'])
+    with pytest.raises(ValueError) as excinfo:
+        ints.extend(zeros((2, 2)))
+    assert 'wrong data shape' in str(excinfo.value).lower()
+    assert len(ints) == 4
@@ -267,3 +267,29 @@ def test_getting_all_children():
 
     assert set(ping.children.all()) == {
         red_mock, blue_mock, green_mock, pink_mock}
+
+
+#############################################################################
+# TEST MODULE PATHS AND RANDOM STREAMS
+#############################################################################
+def test_module_path_is_built_from_children_names():
+    sim_mock = Mock()
+    root, queue, buffer = Ping(sim_mock), Ping(sim_mock), Ping(sim_mock)
+    servers = [Ping(sim_mock), Ping(sim_mock)]
+    root.children['queue'] = queue
+    root.children['servers'] = servers
+    queue.children['buffer'] = buffer
+
+    assert root.path == ''
+    assert queue.path == 'queue'
+    assert buffer.path == 'queue.buffer'
+    assert servers[1].path == 'servers.1'
+
+
+def test_module_rng_uses_stream_named_after_path():
+    sim_mock = Mock()
+    root, queue = Ping(sim_mock), Ping(sim_mock)
+    root.children['queue'] = queue
+
+    assert queue.rng is sim_mock.rng.return_value
+    sim_mock.rng.assert_called_with('queue')
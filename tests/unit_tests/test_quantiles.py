@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from pydesim import P2Quantile, TDigest
+
+
+@pytest.mark.parametrize('p', [0.5, 0.9, 0.99])
+def test_p2_quantile_estimates_exponential_quantiles(p):
+    samples = np.random.default_rng(0).exponential(2.0, 20000)
+    estimate = P2Quantile(p)
+    estimate.extend(samples)
+    assert len(estimate) == 20000
+    exact = np.quantile(samples, p)
+    assert estimate.value() == pytest.approx(exact, rel=0.03)
+
+
+def test_p2_quantile_with_few_samples():
+    estimate = P2Quantile(0.5)
+    with pytest.raises(ValueError):
+        estimate.value()
+    estimate.extend([3, 1, 2])
+    assert estimate.value() == 2
+    estimate = P2Quantile(0.9)
+    estimate.extend([5, 1, 4, 2, 3])
+    assert estimate.value() == np.quantile([1, 2, 3, 4, 5], 0.9)
+    with pytest.raises(ValueError):
+        P2Quantile(1.0)
+
+
+def test_p2_quantile_state():
+    samples = np.random.default_rng(4).normal(0, 1, 1000)
+    estimate = P2Quantile(0.9)
+    estimate.extend(samples[:500])
+    restored = P2Quantile.from_state(estimate.state())
+    assert len(restored) == 500
+    assert restored.value() == estimate.value()
+    estimate.extend(samples[500:])
+    restored.extend(samples[500:])
+    assert restored.value() == estimate.value()
+
+
+def test_tdigest_estimates_quantiles_and_cdf():
+    samples = np.random.default_rng(1).lognormal(0, 1, 100000)
+    digest = TDigest()
+    digest.extend(samples[:50000])
+    for value in samples[50000:]:
+        digest.append(value)
+    assert len(digest) == 100000
+    assert len(digest._means) < 200
+
+    qs = [0.5, 0.9, 0.99, 0.999]
+    np.testing.assert_allclose(digest.quantile(qs), np.quantile(samples, qs),
+                               rtol=0.03)
+    assert digest.quantile(0) == samples.min()
+    assert digest.quantile(1) == samples.max()
+    assert digest.cdf(np.quantile(samples, 0.9)) == pytest.approx(0.9,
+                                                                  abs=0.005)
+
+
+def test_tdigest_merge_matches_single_digest():
+    rng = np.random.default_rng(2)
+    parts = [rng.exponential(1.0, 20000) for _ in range(5)]
+    merged = TDigest()
+    for part in parts:
+        digest = TDigest()
+        digest.extend(part)
+        merged.merge(digest)
+    samples = np.concatenate(parts)
+    assert len(merged) == len(samples)
+    np.testing.assert_allclose(merged.quantile([0.5, 0.99, 0.999]),
+                               np.quantile(samples, [0.5, 0.99, 0.999]),
+                               rtol=0.03)
+
+
+def test_tdigest_without_samples_raises_error():
+    with pytest.raises(ValueError) as excinfo:
+        TDigest().quantile(0.5)
+    assert 'no samples' in str(excinfo.value).lower()
+
+
+def test_tdigest_state():
+    samples = np.random.default_rng(3).normal(0, 1, 10000)
+    digest = TDigest()
+    digest.extend(samples)
+    restored = TDigest.from_state(digest.state())
+    assert len(restored) == 10000
+    np.testing.assert_allclose(restored.quantile([0.01, 0.5, 0.99]),
+                               digest.quantile([0.01, 0.5, 0.99]))
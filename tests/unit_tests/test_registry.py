@@ -0,0 +1,102 @@
+import math
+import mmap
+import pickle
+
+import numpy as np
+import pytest
+
+from pydesim import StatisticsRegistry, Statistic, Trace, Intervals, \
+    TimeAverage, Histogram
+
+
+def test_registry_returns_same_statistic_by_name():
+    stats = StatisticsRegistry()
+    delay = stats.statistic('server.delay')
+    assert stats.statistic('server.delay') is delay
+    assert stats['server.delay'] is delay
+    assert 'server.delay' in stats
+    assert isinstance(stats.trace('queue.size'), Trace)
+    assert isinstance(stats.intervals('source.intervals'), Intervals)
+    assert isinstance(stats.time_average('queue.avg'), TimeAverage)
+    assert isinstance(stats.histogram('server.hist', 0, 10), Histogram)
+    assert list(stats) == ['server.delay', 'queue.size', 'source.intervals',
+                           'queue.avg', 'server.hist']
+    with pytest.raises(ValueError) as excinfo:
+        stats.trace('server.delay')
+    assert 'registered as statistic' in str(excinfo.value).lower()
+
+
+def test_registry_add_existing_statistic():
+    stats = StatisticsRegistry()
+    st = Statistic([1, 2])
+    assert stats.add('x', st) is st
+    stats.add('x', st)
+    with pytest.raises(ValueError):
+        stats.add('x', Statistic())
+    with pytest.raises(TypeError):
+        stats.add('y', [1, 2])
+
+
+def test_registry_reset():
+    stats = StatisticsRegistry()
+    stats.statistic('delay').extend([1, 2, 3])
+    stats.trace('size').record(0, 5)
+    stats.tdigest('digest').extend([1, 2])
+    stats.reset(10)
+    assert stats['delay'].empty
+    assert stats['size'].as_tuple() == ((10, 5),)
+    assert len(stats['digest']) == 0
+
+
+def test_registry_summary():
+    stats = StatisticsRegistry()
+    stats.statistic('delay').extend([1, 3])
+    stats.trace('size')
+    summary = stats.summary()
+    assert summary['delay.count'] == 2
+    assert summary['delay.mean'] == 2
+    assert summary['delay.std'] == 1
+    assert summary['size.count'] == 0
+    assert math.isnan(summary['size.timeavg'])
+
+    array = stats.summary(structured=True)
+    assert array.shape == (1,)
+    assert array['delay.mean'][0] == 2
+    assert array.dtype['delay.count'] == np.int64
+
+
+def test_registry_state():
+    stats = StatisticsRegistry()
+    stats.statistic('delay', store=False).extend(np.arange(100000))
+    stats.trace('size').record(0, 5)
+    stats.intervals('arrivals').record(3)
+    state = pickle.loads(pickle.dumps(stats.state()))
+    restored = StatisticsRegistry.from_state(state)
+    assert restored.summary() == stats.summary()
+    assert restored['size'].as_tuple() == ((0, 5),)
+    assert restored['arrivals'].as_tuple() == (3,)
+
+
+def _is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+def test_registry_save_and_load(tmp_path):
+    stats = StatisticsRegistry()
+    stats.statistic('server.delay').extend(np.arange(1000))
+    stats.statistic('server.wait', store=False).extend(np.arange(10))
+    stats.trace('queue.size').record(0, 5)
+    stats.histogram('server.hist', 0, 100).extend(np.arange(1000))
+    stats.p2_quantile('server.median', 0.5).append(1)
+    stats.save(tmp_path / 'results')
+    assert (tmp_path / 'results' / 'server.delay' / 'samples.npy').exists()
+
+    loaded = StatisticsRegistry.load(tmp_path / 'results')
+    assert list(loaded) == ['server.delay', 'server.wait', 'queue.size',
+                            'server.hist', 'server.median']
+    assert _is_memory_mapped(loaded['server.delay'].asarray())
+    assert loaded.summary() == stats.summary()
@@ -1,8 +1,13 @@
+import os
 from unittest.mock import patch, ANY, Mock
 
+import numpy as np
 import pytest
 
-from pydesim import simulate, Model
+from pydesim import simulate, Model, Precision, Replications, Statistic, \
+    Trace, Intervals
+from pydesim.statistics import _transfer_dir
+from pydesim.simulator import _Journal
 
 
 def test_simulate_signature():
@@ -276,3 +281,367 @@ def test_simulate_calls_constructor_without_parameters_but_with_sim():
                 assert sim.params.y == 'hello'
         
         result = simulate(SomeModel, params={'x': 10, 'y': 'hello'})
+
+
+#
+# Test sequential stopping of replications. Functions passed to simulate()
+# are defined at module level, so they can be pickled to worker processes.
+#
+class _Samples(list):
+    def __init__(self, mean):
+        super().__init__()
+
+
+def _draw_exponentials(sim):
+    sim.data.extend(np.random.exponential(sim.params.mean, 100))
+
+
+def _sample_mean(sim):
+    return float(np.mean(sim.data))
+
+
+def test_precision_requires_some_tolerance():
+    with pytest.raises(ValueError) as excinfo:
+        Precision()
+    assert 'tolerance expected' in str(excinfo.value).lower()
+
+
+def test_precision_requires_extract_function():
+    with pytest.raises(ValueError) as excinfo:
+        simulate(_Samples, init=_draw_exponentials, params={'mean': 1},
+                 precision=Precision(abs_tol=0.1))
+    assert 'extract function required' in str(excinfo.value).lower()
+
+
+def test_replications_interval_estimation():
+    est = Replications([1, 2, 3, 4, 5], confidence=0.95)
+    assert len(est) == 5
+    assert est.mean == 3
+    np.testing.assert_allclose(est.half_width, 2.776 * (2.5 / 5) ** 0.5,
+                               rtol=1e-3)
+    low, high = est.interval()
+    np.testing.assert_allclose([low, high], [3 - est.half_width,
+                                             3 + est.half_width])
+    assert Replications([1]).half_width == float('inf')
+
+
+def test_simulate_runs_replications_until_precision_reached():
+    ret = simulate(_Samples, init=_draw_exponentials, params={'mean': 2},
+                   extract=_sample_mean,
+                   precision=Precision(rel_tol=0.05, batch_size=3))
+    assert isinstance(ret, Replications)
+    assert ret.converged
+    assert ret.half_width <= 0.05 * ret.mean
+    assert len(ret) >= 5
+    assert len(set(ret.values)) == len(ret)
+    np.testing.assert_allclose(ret.mean, 2, rtol=0.15)
+
+
+def test_simulate_stops_replications_when_budget_exhausted():
+    ret = simulate(_Samples, init=_draw_exponentials, params={'mean': 1},
+                   extract=_sample_mean,
+                   precision=Precision(abs_tol=1e-9, max_replications=7))
+    assert not ret.converged
+    assert len(ret) == 7
+
+
+def test_simulate_runs_replications_in_parallel_for_each_point():
+    ret = simulate(_Samples, init=_draw_exponentials,
+                   params=[{'mean': 1}, {'mean': 10}],
+                   extract=_sample_mean, processes=2,
+                   precision=Precision(rel_tol=0.1, max_replications=40))
+    assert len(ret) == 2
+    assert all(est.converged for est in ret)
+    # Worker processes are reseeded, so replications must differ:
+    assert len(set(ret[0].values)) == len(ret[0])
+    assert ret[0].mean < ret[1].mean
+
+
+def test_simulate_sweep_in_parallel_returns_extracted_values():
+    ret = simulate(_Samples, init=_draw_exponentials,
+                   params=[{'mean': 1}, {'mean': 1000}],
+                   extract=_sample_mean, processes=2)
+    assert len(ret) == 2
+    assert ret[0] < ret[1]
+
+    with pytest.raises(ValueError) as excinfo:
+        simulate(_Samples, init=_draw_exponentials, params=[{'mean': 1}],
+                 processes=2)
+    assert 'extract function required' in str(excinfo.value).lower()
+
+
+#
+# Test warm-up detection in simulate()
+#
+class _TransientData:
+    def __init__(self):
+        self.values = Statistic()
+        self.trace = Trace()
+
+
+def _transient_init(sim):
+    sim.schedule(1, _transient_step)
+
+
+def _transient_step(sim):
+    value = 10 + 50 * max(0., 1 - sim.stime / 500) + np.random.normal()
+    sim.data.values.append(value)
+    sim.data.trace.record(sim.stime, value)
+    sim.schedule(1, _transient_step)
+
+
+def test_simulate_resets_statistics_after_detected_warmup():
+    ret = simulate(_TransientData, init=_transient_init, stime_limit=20000,
+                   warmup='auto')
+    assert 500 <= ret.warmup_time <= 10000
+    assert len(ret.data.values) < 20000 - 500
+    assert ret.data.trace.as_tuple()[0][0] == ret.warmup_time
+    np.testing.assert_allclose(ret.data.values.mean(), 10, atol=0.1)
+    np.testing.assert_allclose(ret.data.trace.timeavg(), 10, atol=0.1)
+
+
+def test_simulate_resets_statistics_at_given_warmup_time():
+    ret = simulate(_TransientData, init=_transient_init, stime_limit=2000,
+                   warmup=1000)
+    assert ret.warmup_time == 1000
+    assert len(ret.data.values) == 1001
+    assert ret.data.trace.as_tuple()[0][0] == 1000
+
+    # Events at the warm-up time are handled after the reset:
+    ret = simulate(_TransientData, init=_transient_init, stime_limit=20000,
+                   warmup=5000)
+    assert len(ret.data.values) == 15001
+
+    # Without an event at the warm-up time, the reset is still at this time:
+    ret = simulate(_TransientData, init=_transient_init, stime_limit=2000,
+                   warmup=999.5)
+    assert ret.warmup_time == 999.5
+    assert len(ret.data.values) == 1001
+    assert ret.data.trace.as_tuple()[0][0] == 999.5
+
+
+def test_simulate_without_warmup_keeps_all_samples():
+    ret = simulate(_TransientData, init=_transient_init, stime_limit=2000)
+    assert ret.warmup_time is None
+    assert len(ret.data.values) == 2000
+
+
+#
+# Test transfer of large statistics from worker processes
+#
+class _LargeStatistics:
+    def __init__(self, size):
+        self.samples = Statistic(np.arange(size))
+        self.trace = Trace([np.arange(size), np.arange(size) % 3])
+        self.intervals = Intervals(list(range(1, size + 1)))
+
+
+def _get_statistics(sim):
+    return sim.data.samples, sim.data.trace, sim.data.intervals
+
+
+def _transferred_files():
+    return {name for name in os.listdir(_transfer_dir())
+            if name.startswith('pydesim-')}
+
+
+def test_parallel_sweep_transfers_large_statistics_via_files():
+    files_before = _transferred_files()
+    ret = simulate(_LargeStatistics, params=[{'size': 100000}, {'size': 10}],
+                   extract=_get_statistics, processes=2)
+    assert _transferred_files() == files_before
+
+    (samples, trace, intervals), (small_samples, _, _) = ret
+    assert len(samples) == 100000
+    assert samples.mean() == 49999.5
+    np.testing.assert_allclose(trace.timeavg(), 1, rtol=1e-4)
+    assert intervals.as_tuple()[:3] == (1, 1, 1)
+    assert small_samples.as_tuple() == tuple(range(10))
+
+    # Received statistics remain writable:
+    samples.append(100000)
+    trace.record(100000, 0)
+    intervals.record(100002)
+    assert len(samples) == 100001
+    assert len(trace) == 100001
+    assert intervals.as_tuple()[-1] == 2
+
+
+#
+# Test random streams and common random numbers
+#
+class _Policy:
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.arrivals = []
+        self.services = []
+
+
+def _draw_from_streams(sim):
+    sim.data.arrivals.extend(sim.rng('source.arrivals').exponential(1, 5))
+    sim.data.services.extend(sim.rng('server').exponential(1, 5))
+
+
+def _get_variates(sim):
+    return sim.data.arrivals, sim.data.services
+
+
+def test_named_streams_are_determined_by_seed_and_name():
+    ret1 = simulate([], seed=1)
+    ret2 = simulate([], seed=1)
+    ret3 = simulate([], seed=2)
+
+    assert ret1.rng('a') is ret1.rng('a')
+    assert ret1.rng('a').random() == ret2.rng('a').random()
+    assert ret1.rng('b').random() != ret1.rng('a').random()
+    assert ret1.rng('b').random() != ret3.rng('b').random()
+
+
+@pytest.mark.parametrize('processes', [None, 2])
+def test_sweep_with_seed_uses_common_random_numbers(processes):
+    params = [{'threshold': 1}, {'threshold': 2}]
+    ret = simulate(_Policy, init=_draw_from_streams, params=params, seed=42,
+                   extract=_get_variates, processes=processes)
+    assert ret[0] == ret[1]
+    assert ret[0][0] != ret[0][1]
+
+    other = simulate(_Policy, init=_draw_from_streams, params=params,
+                     seed=43, extract=_get_variates, processes=processes)
+    assert other[0][0] != ret[0][0]
+
+
+def test_replications_with_seed_differ_but_are_reproducible():
+    precision = Precision(abs_tol=1e-9, max_replications=5)
+    ret1 = simulate(_Samples, init=_draw_exponentials, params={'mean': 1},
+                    extract=_sample_mean, precision=precision, seed=7)
+    ret2 = simulate(_Samples, init=_draw_exponentials, params={'mean': 1},
+                    extract=_sample_mean, precision=precision, seed=7,
+                    processes=2)
+    assert len(set(ret1.values)) == 5
+    assert ret1.values == ret2.values
+
+
+#
+# Test resumable sweeps with journal
+#
+class _Counter:
+    calls = 0
+
+    def __init__(self, x):
+        _Counter.calls += 1
+        self.x = x
+
+
+def _get_x(sim):
+    return sim.data.x
+
+
+def _get_x_name(sim):
+    return f'x={sim.data.x}'
+
+
+def test_journal_requires_extract_function(tmp_path):
+    with pytest.raises(ValueError) as excinfo:
+        simulate(_Counter, params=[{'x': 1}], journal=tmp_path / 'journal')
+    assert 'extract function required' in str(excinfo.value).lower()
+
+
+def test_sweep_with_journal_skips_completed_points(tmp_path):
+    path = tmp_path / 'sweep.journal'
+    _Counter.calls = 0
+    ret = simulate(_Counter, params=[{'x': 1}, {'x': 2}], extract=_get_x,
+                   journal=path)
+    assert ret == [1, 2]
+    assert _Counter.calls == 2
+
+    ret = simulate(_Counter, params=[{'x': 2}, {'x': 3}, {'x': 1}],
+                   extract=_get_x, journal=path)
+    assert ret == [2, 3, 1]
+    assert _Counter.calls == 3
+
+    # Points with other simulation settings are computed again:
+    simulate(_Counter, params=[{'x': 1}], extract=_get_x, journal=path,
+             stime_limit=10)
+    assert _Counter.calls == 4
+
+    # And so are points with another extract function:
+    ret = simulate(_Counter, params=[{'x': 1}], extract=_get_x_name,
+                   journal=path)
+    assert ret == ['x=1']
+    assert _Counter.calls == 5
+
+
+def test_journal_drops_record_torn_by_crash(tmp_path):
+    path = tmp_path / 'sweep.journal'
+    simulate(_Counter, params=[{'x': 1}, {'x': 2}], extract=_get_x,
+             journal=path)
+    with open(path, 'r+b') as f:
+        f.truncate(path.stat().st_size - 3)
+
+    _Counter.calls = 0
+    ret = simulate(_Counter, params=[{'x': 1}, {'x': 2}], extract=_get_x,
+                   journal=path)
+    assert ret == [1, 2]
+    assert _Counter.calls == 1
+
+    _Counter.calls = 0
+    simulate(_Counter, params=[{'x': 1}, {'x': 2}], extract=_get_x,
+             journal=path)
+    assert _Counter.calls == 0
+
+
+def test_journal_key_encodes_values_canonically():
+    a, b = np.zeros(2000), np.zeros(2000)
+    b[1000] = 1
+    assert repr(a) == repr(b)
+    assert _Journal.key({'x': a}) != _Journal.key({'x': b})
+    assert _Journal.key({'x': a}) == _Journal.key({'x': a.copy()})
+    assert _Journal.key({'x': a}) != _Journal.key({'x': a.reshape(2, -1)})
+    assert _Journal.key({'x': 1, 'y': 'a'}, 10) == \
+        _Journal.key({'y': 'a', 'x': 1}, 10)
+    assert _Journal.key({'x': 1}) != _Journal.key({'x': 1.0})
+    assert _Journal.key({'x': 1}) != _Journal.key({'x': '1'})
+    with pytest.raises(TypeError):
+        _Journal.key({'x': object()})
+
+
+def test_parallel_sweep_with_journal(tmp_path):
+    path = tmp_path / 'sweep.journal'
+    params = [{'mean': mean} for mean in (1, 10, 100)]
+    ret1 = simulate(_Samples, init=_draw_exponentials, params=params,
+                    extract=_sample_mean, processes=2, journal=path)
+    ret2 = simulate(_Samples, init=_draw_exponentials, params=params,
+                    extract=_sample_mean, processes=2, journal=path)
+    assert ret1 == ret2
+
+
+#
+# Test statistics registry
+#
+class _RegistryModel(Model):
+    def __init__(self, sim):
+        super().__init__(sim)
+        self.delays = sim.stats.statistic('server.delay')
+        self.sim.schedule(1, self.step)
+
+    def step(self):
+        value = 10 + 50 * max(0., 1 - self.sim.stime / 100)
+        self.delays.append(value)
+        self.sim.stats.trace('queue.size').record(self.sim.stime, value)
+        self.sim.schedule(1, self.step)
+
+
+def _get_summary(sim):
+    return sim.stats.summary()
+
+
+def test_simulate_extracts_registry_summary_after_warmup():
+    ret = simulate(_RegistryModel, stime_limit=1000, warmup=500,
+                   extract=_get_summary, params=[{}, {}], processes=2)
+    for summary in ret:
+        assert set(summary) == {
+            'server.delay.count', 'server.delay.mean', 'server.delay.std',
+            'queue.size.count', 'queue.size.timeavg'}
+        assert summary['server.delay.count'] == 501
+        assert summary['server.delay.mean'] == 10
+        assert summary['queue.size.timeavg'] == 10
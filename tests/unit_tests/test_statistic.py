@@ -1,3 +1,7 @@
+import mmap
+import os
+import pickle
+
 import numpy as np
 import pytest
 
@@ -171,3 +175,432 @@ def test_lag_k_estimation_for_positive_k():
     np.testing.assert_almost_equal(st.lag(1), 0)
     np.testing.assert_almost_equal(st.lag(2), -1)
     np.testing.assert_almost_equal(st.lag(3), 0)
+
+
+#
+# Test warm-up detection and reset
+#
+def _transient_data(warmup_length=200, steady_length=2000):
+    rng = np.random.default_rng(1)
+    transient = np.linspace(50, 0, warmup_length)
+    return np.concatenate((transient, np.zeros(steady_length))) + \
+        rng.normal(10, 1, warmup_length + steady_length)
+
+
+def test_warmup_raises_error_when_called_for_empty_statistic():
+    with pytest.raises(ValueError) as excinfo:
+        Statistic().warmup()
+    assert 'no data' in str(excinfo.value).lower()
+
+
+def test_warmup_raises_error_for_invalid_method():
+    with pytest.raises(ValueError) as excinfo:
+        Statistic(_transient_data()).warmup('wrong')
+    assert 'invalid method' in str(excinfo.value).lower()
+
+
+@pytest.mark.parametrize('method', ['mser', 'welch'])
+def test_warmup_detects_initial_transient(method):
+    st = Statistic(_transient_data())
+    assert 150 <= st.warmup(method) <= 300
+
+
+@pytest.mark.parametrize('method', ['mser', 'welch'])
+def test_warmup_of_stationary_data_is_short(method):
+    st = Statistic(np.random.default_rng(2).normal(10, 1, 2000))
+    assert st.warmup(method) < 1000
+
+
+@pytest.mark.parametrize('method', ['mser', 'welch'])
+def test_warmup_of_zero_mean_data(method):
+    rng = np.random.default_rng(3)
+    assert Statistic(rng.normal(0, 1, 2000)).warmup(method) < 500
+    transient = 10 * np.exp(-np.arange(2200) / 50) + rng.normal(0, 1, 2200)
+    assert 50 <= Statistic(transient).warmup(method) <= 500
+
+
+def test_statistic_reset_removes_data():
+    st = Statistic([1, 2, 3])
+    st.reset()
+    assert st.empty
+    st.append(5)
+    assert st.as_tuple() == (5,)
+
+
+#
+# Test streaming statistic (store=False)
+#
+def test_streaming_statistic_is_initially_empty():
+    st = Statistic(store=False)
+    assert not st.store
+    assert st.empty
+    assert len(st) == 0
+    with pytest.raises(ValueError) as excinfo:
+        st.mean()
+    assert 'no data' in str(excinfo.value).lower()
+
+
+def test_streaming_statistic_estimates_moments():
+    data = np.random.default_rng(0).exponential(3, 1000)
+    stored = Statistic(data)
+    streaming = Statistic(data[:10], store=False)
+    for value in data[10:500]:
+        streaming.append(value)
+    streaming.extend(data[500:])
+
+    assert len(streaming) == 1000
+    np.testing.assert_allclose(streaming.mean(), stored.mean())
+    np.testing.assert_allclose(streaming.std(), stored.std())
+    np.testing.assert_allclose(streaming.var(), stored.var())
+    for k in (1, 2, 3, 4):
+        np.testing.assert_allclose(streaming.moment(k), stored.moment(k))
+
+
+def test_streaming_statistic_raises_error_when_samples_needed():
+    st = Statistic([1, 2, 3], store=False)
+    for method in (st.as_list, st.as_tuple, st.asarray, st.pmf,
+                   lambda: st.lag(1), lambda: st.moment(5)):
+        with pytest.raises(ValueError):
+            method()
+    with pytest.raises(ValueError) as excinfo:
+        st.as_list()
+    assert 'does not store samples' in str(excinfo.value).lower()
+
+
+def test_streaming_statistic_extend_raises_error_when_noniterable_passed():
+    st = Statistic(store=False)
+    with pytest.raises(TypeError) as excinfo:
+        st.extend(1)
+    assert 'not iterable' in str(excinfo.value).lower()
+
+
+def test_streaming_statistic_reset():
+    st = Statistic([1, 2], store=False)
+    st.reset()
+    assert st.empty
+    st.append(5)
+    assert st.mean() == 5
+
+
+#
+# Test array-backed storage
+#
+def test_statistic_asarray_returns_readonly_view_without_copying():
+    st = Statistic([1, 2, 3])
+    ar1, ar2 = st.asarray(), st.asarray()
+    assert np.shares_memory(ar1, ar2)
+    assert not ar1.flags.writeable
+    st.append(4)
+    np.testing.assert_equal(ar1, [1, 2, 3])
+    np.testing.assert_equal(st.asarray(), [1, 2, 3, 4])
+
+
+def test_statistic_grows_storage_when_appending_many_values():
+    st = Statistic()
+    for i in range(1000):
+        st.append(i)
+    st.extend(np.arange(1000, 5000))
+    assert len(st) == 5000
+    np.testing.assert_equal(st.asarray(), np.arange(5000))
+
+
+def test_statistic_appends_while_views_are_held():
+    st = Statistic()
+    views = []
+    for i in range(100):
+        st.append(i)
+        assert len(st) == i + 1
+        views.append(st.asarray())
+    np.testing.assert_equal(views[9], np.arange(10))
+    np.testing.assert_equal(st.asarray(), np.arange(100))
+
+
+#
+# Test PMF
+#
+def test_statistic_pmf_counts_values():
+    st = Statistic([3, 1, 3, 2, 3, 1])
+    assert st.pmf() == {1: 2, 2: 1, 3: 3}
+    assert Statistic().pmf() == {}
+
+
+def test_statistic_pmf_arrays():
+    values, counts = Statistic([3, 1, 3, 2, 3, 1]).pmf_arrays()
+    np.testing.assert_equal(values, [1, 2, 3])
+    np.testing.assert_equal(counts, [2, 1, 3])
+
+
+#
+# Test batch means and confidence intervals
+#
+def _ar1(n, phi=0.9, mean=5., seed=0):
+    noise = np.random.default_rng(seed).normal(0, 1, n)
+    data = np.empty(n)
+    data[0] = mean
+    for i in range(1, n):
+        data[i] = mean + phi * (data[i - 1] - mean) + noise[i]
+    return data
+
+
+def test_batch_means_of_stored_samples():
+    st = Statistic(range(1, 14))
+    np.testing.assert_allclose(st.batch_means(3), [3.5, 7.5, 11.5])
+    with pytest.raises(ValueError) as excinfo:
+        st.batch_means(14)
+    assert 'too few samples' in str(excinfo.value).lower()
+    with pytest.raises(ValueError):
+        st.batch_means(2.5)
+
+
+@pytest.mark.parametrize('num_appended', [0, 100, 256])
+def test_batch_means_of_streaming_statistic_match_stored(num_appended):
+    data = np.random.default_rng(1).normal(0, 1, 256)
+    stored = Statistic(data)
+    streaming = Statistic(store=False)
+    for value in data[:num_appended]:
+        streaming.append(value)
+    streaming.extend(data[num_appended:])
+    for num_batches in (2, 4, 8):
+        np.testing.assert_allclose(streaming.batch_means(num_batches),
+                                   stored.batch_means(num_batches))
+
+
+def test_batch_means_of_streaming_statistic_use_all_kept_batches():
+    data = np.arange(10000.)
+    streaming = Statistic(data, store=False)
+    size, num_kept = streaming._batches.size, len(streaming._batches.sums)
+    used = size * num_kept
+    assert used == 10000 - streaming._batches.partial_count
+    assert used > 10000 - size
+    bounds = np.arange(21) * num_kept // 20 * size
+    np.testing.assert_allclose(
+        streaming.batch_means(20),
+        [data[start:end].mean() for start, end in zip(bounds, bounds[1:])])
+
+
+@pytest.mark.parametrize('store', [True, False])
+def test_batch_means_confidence_interval_covers_mean(store):
+    st = Statistic(_ar1(100000), store=store)
+    low, high = st.confidence_interval(0.95)
+    assert low < 5 < high
+    assert high - low < 0.3
+
+    # Naive interval ignores autocorrelation and is much narrower:
+    iid_low, iid_high = st.confidence_interval(0.95, method='iid')
+    assert iid_high - iid_low < (high - low) / 2
+
+
+def test_confidence_interval_with_invalid_method_raises_error():
+    with pytest.raises(ValueError) as excinfo:
+        Statistic(range(100)).confidence_interval(method='wrong')
+    assert 'invalid method' in str(excinfo.value).lower()
+
+
+def test_quantile_of_stored_samples():
+    st = Statistic(range(101))
+    assert st.quantile(0.5) == 50
+    np.testing.assert_allclose(st.quantile([0.1, 0.99]), [10, 99])
+    with pytest.raises(ValueError):
+        Statistic([1, 2], store=False).quantile(0.5)
+
+
+#
+# Test disk storage
+#
+def test_disk_storage_matches_memory_storage():
+    data = np.random.default_rng(0).exponential(2.0, 150000)
+    memory, disk = Statistic(data[:100]), Statistic(data[:100], storage='disk')
+    for value in data[100:1000]:
+        memory.append(value)
+        disk.append(value)
+    memory.extend(data[1000:])
+    disk.extend(data[1000:])
+
+    assert len(disk) == len(data)
+    assert isinstance(disk.asarray(), np.memmap)
+    np.testing.assert_array_equal(disk.asarray(), data)
+    np.testing.assert_allclose(disk.mean(), memory.mean())
+    np.testing.assert_allclose(disk.var(), memory.var())
+    np.testing.assert_allclose(disk.moment(3), memory.moment(3))
+    np.testing.assert_allclose(disk.batch_means(10), memory.batch_means(10))
+
+
+def test_disk_storage_pmf_is_merged_over_chunks():
+    data = np.random.default_rng(1).integers(0, 20, 150000)
+    disk = Statistic(data, storage='disk')
+    values, counts = disk.pmf_arrays()
+    expected_values, expected_counts = np.unique(data, return_counts=True)
+    np.testing.assert_array_equal(values, expected_values)
+    np.testing.assert_array_equal(counts, expected_counts)
+    assert counts.dtype.kind == 'i'
+    assert disk.pmf() == Statistic(data).pmf()
+
+
+def test_disk_storage_file_is_valid_npy_and_removed_with_statistic():
+    st = Statistic([1, 2, 3], storage='disk')
+    path = st._data.path
+    st.append(4)
+    np.testing.assert_array_equal(st.asarray(), [1, 2, 3, 4])
+    np.testing.assert_array_equal(np.load(path), [1, 2, 3, 4])
+    st.reset()
+    assert not os.path.exists(path)
+    assert st.empty
+
+
+def test_invalid_storage_raises_error():
+    with pytest.raises(ValueError) as excinfo:
+        Statistic(storage='wrong')
+    assert 'invalid storage' in str(excinfo.value).lower()
+
+
+#
+# Test merging and states
+#
+def test_merge_streaming_statistics_is_exact():
+    rng = np.random.default_rng(3)
+    parts = [rng.normal(i, 1 + i, 1000 * (i + 1)) for i in range(4)]
+    merged = Statistic(store=False)
+    for part in parts:
+        merged.merge(Statistic.from_state(Statistic(part, store=False).state()))
+    samples = np.concatenate(parts)
+    assert len(merged) == len(samples)
+    np.testing.assert_allclose(merged.mean(), samples.mean())
+    np.testing.assert_allclose(merged.var(), samples.var())
+    np.testing.assert_allclose(merged.moment(4), np.mean(samples ** 4))
+    assert len(merged.batch_means(20)) == 20
+
+
+def test_merge_stored_statistics():
+    stored = Statistic([1, 2])
+    stored.merge(Statistic([3, 4]))
+    assert stored.as_tuple() == (1, 2, 3, 4)
+
+    streaming = Statistic(store=False)
+    streaming.merge(stored)
+    assert streaming.mean() == 2.5
+    with pytest.raises(ValueError):
+        stored.merge(streaming)
+    assert Statistic.from_state(stored.state()).as_tuple() == (1, 2, 3, 4)
+
+
+def test_streaming_statistic_state_is_compact():
+    st = Statistic(np.arange(1000000), store=False)
+    restored = Statistic.from_state(st.state())
+    assert restored.mean() == st.mean()
+    np.testing.assert_array_equal(restored.batch_means(4), st.batch_means(4))
+    assert len(pickle.dumps(st.state())) < 4096
+
+
+#
+# Test autocorrelation
+#
+def test_acf_matches_direct_computation():
+    data = np.random.default_rng(4).normal(0, 1, 500)
+    x = data - data.mean()
+    expected = [np.dot(x[:len(x) - k], x[k:]) / np.dot(x, x)
+                for k in range(11)]
+    np.testing.assert_allclose(Statistic(data).acf(10), expected)
+    assert len(Statistic(data).acf()) == 500
+
+
+def test_autocorrelation_time_of_ar1_process():
+    st = Statistic(_ar1(200000, phi=0.9))
+    np.testing.assert_allclose(st.acf(3), 0.9 ** np.arange(4), atol=0.02)
+    assert st.autocorrelation_time() == pytest.approx(19, rel=0.15)
+    independent = Statistic(np.random.default_rng(5).normal(0, 1, 10000))
+    assert independent.autocorrelation_time() == pytest.approx(1, abs=0.2)
+
+
+def test_acf_errors():
+    with pytest.raises(ValueError):
+        Statistic([1]).acf()
+    with pytest.raises(ValueError):
+        Statistic([1, 2, 3]).acf(3)
+    with pytest.raises(ValueError) as excinfo:
+        Statistic([2, 2, 2]).acf()
+    assert 'zero variance' in str(excinfo.value).lower()
+
+
+#
+# Test reservoir sampling
+#
+def test_reservoir_keeps_uniform_sample_and_exact_moments():
+    data = np.random.default_rng(6).normal(3, 2, 200000)
+    st = Statistic(reservoir_size=1000, rng=np.random.default_rng(7))
+    st.extend(data[:100])
+    for value in data[100:50000]:
+        st.append(value)
+    st.extend(data[50000:])
+
+    assert not st.store
+    assert len(st) == 200000
+    np.testing.assert_allclose(st.mean(), data.mean())
+    np.testing.assert_allclose(st.var(), data.var())
+    sample = st.reservoir()
+    assert len(sample) == 1000
+    assert len(np.intersect1d(sample, data)) == 1000
+    # Kept samples are spread uniformly over the whole stream:
+    kept_indices = np.flatnonzero(np.isin(data, sample))
+    assert 0.4 < np.mean(kept_indices < 100000) < 0.6
+    assert abs(np.mean(sample) - 3) < 0.3
+    with pytest.raises(ValueError):
+        st.asarray()
+
+
+def test_reservoir_with_few_samples_keeps_all():
+    st = Statistic([1, 2, 3], reservoir_size=10)
+    assert sorted(st.reservoir()) == [1, 2, 3]
+    st.reset()
+    assert len(st.reservoir()) == 0
+    with pytest.raises(ValueError) as excinfo:
+        Statistic([1, 2]).reservoir()
+    assert 'no reservoir' in str(excinfo.value).lower()
+
+
+def test_merge_reservoirs():
+    rng = np.random.default_rng(8)
+    first = Statistic(np.zeros(30000), reservoir_size=500, rng=rng)
+    second = Statistic(np.ones(10000), reservoir_size=500, rng=rng)
+    first.merge(Statistic.from_state(second.state()))
+    assert len(first) == 40000
+    sample = first.reservoir()
+    assert len(sample) == 500
+    assert 0.15 < sample.mean() < 0.35
+    first.extend(np.ones(40000))
+    assert 0.5 < first.reservoir().mean() < 0.75
+
+
+#
+# Test saving and loading
+#
+def _is_memory_mapped(array):
+    while array is not None:
+        if isinstance(array, (np.memmap, mmap.mmap)):
+            return True
+        array = getattr(array, 'base', None)
+    return False
+
+
+@pytest.mark.parametrize('store', [True, False])
+def test_save_and_load(tmp_path, store):
+    data = np.random.default_rng(9).normal(0, 1, 10000)
+    Statistic(data, store=store).save(tmp_path / 'delay')
+    loaded = Statistic.load(tmp_path / 'delay')
+    assert loaded.store == store
+    assert len(loaded) == 10000
+    np.testing.assert_allclose(loaded.mean(), data.mean())
+    if store:
+        assert _is_memory_mapped(loaded.asarray())
+        loaded.append(1)
+        assert len(loaded) == 10001
+        assert len(Statistic.load(tmp_path / 'delay')) == 10000
+
+
+def test_loaded_statistic_merges_empty_statistic(tmp_path):
+    Statistic([1, 2, 3]).save(tmp_path / 'delay')
+    loaded = Statistic.load(tmp_path / 'delay')
+    loaded.merge(Statistic())
+    loaded.extend([])
+    assert _is_memory_mapped(loaded.asarray())
+    loaded.merge(Statistic([4]))
+    assert loaded.as_tuple() == (1, 2, 3, 4)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from pydesim import TimeAverage, Trace
+
+
+@pytest.mark.parametrize('data', [
+    [(0, 0), (1, 10), (4, 20), (5, 0)],
+    [(0, 0), (1, 10), (2, 10), (4, 20), (5, 0)],
+    [(0, 2), (8, 3), (11, 4), (12, 3), (16, 2)],
+])
+def test_time_average_matches_trace(data):
+    avg = TimeAverage()
+    for t, v in data:
+        avg.record(t, v)
+    trace = Trace(data)
+    assert len(avg) == len(data)
+    assert avg.timeavg() == pytest.approx(trace.timeavg())
+    assert avg.pmf() == pytest.approx(trace.pmf())
+
+    times, values = trace.asarray('split')
+    durations = np.diff(times)
+    mean = np.dot(values[:-1], durations) / durations.sum()
+    expected_var = np.dot((values[:-1] - mean) ** 2, durations) / \
+        durations.sum()
+    assert avg.var() == pytest.approx(expected_var)
+    assert avg.std() == pytest.approx(np.sqrt(expected_var))
+
+
+def test_time_average_holds_last_value_until_given_time():
+    avg = TimeAverage()
+    avg.record(0, 1)
+    avg.record(2, 3)
+    assert avg.timeavg() == 1
+    assert avg.timeavg(4) == 2
+    assert avg.pmf(4) == {1: 0.5, 3: 0.5}
+    with pytest.raises(ValueError):
+        avg.timeavg(1)
+
+
+def test_time_average_errors():
+    avg = TimeAverage(track_pmf=False)
+    with pytest.raises(ValueError) as excinfo:
+        avg.timeavg()
+    assert 'expected non-empty values' in str(excinfo.value).lower()
+    avg.record(5, 1)
+    with pytest.raises(ValueError) as excinfo:
+        avg.timeavg()
+    assert 'zero duration' in str(excinfo.value).lower()
+    with pytest.raises(ValueError) as excinfo:
+        avg.record(4, 2)
+    assert 'adding data in past prohibited' in str(excinfo.value).lower()
+    avg.record(6, 2)
+    with pytest.raises(ValueError) as excinfo:
+        avg.pmf()
+    assert 'not tracked' in str(excinfo.value).lower()
+
+
+def test_time_average_reset_keeps_last_value():
+    avg = TimeAverage()
+    avg.record(0, 5)
+    avg.record(10, 1)
+    avg.reset(20)
+    assert len(avg) == 1
+    avg.record(30, 2)
+    assert avg.timeavg() == 1
+    assert avg.pmf() == {1: 1.0}
+    avg.reset()
+    assert avg.empty
+
+
+def test_merge_time_averages():
+    rng = np.random.default_rng(0)
+    merged = TimeAverage()
+    all_durations, all_values = [], []
+    for _ in range(3):
+        times = np.cumsum(rng.exponential(1.0, 1000))
+        values = rng.integers(0, 5, 1000)
+        part = TimeAverage()
+        for t, v in zip(times, values):
+            part.record(t, v)
+        merged.merge(TimeAverage.from_state(part.state()))
+        all_durations.append(np.diff(times))
+        all_values.append(values[:-1])
+    durations = np.concatenate(all_durations)
+    values = np.concatenate(all_values)
+    mean = np.dot(values, durations) / durations.sum()
+    assert len(merged) == 3000
+    assert merged.timeavg() == pytest.approx(mean)
+    assert merged.var() == pytest.approx(
+        np.dot((values - mean) ** 2, durations) / durations.sum())
+    assert merged.pmf() == pytest.approx(
+        {v: durations[values == v].sum() / durations.sum() for v in range(5)})
@@ -1,7 +1,9 @@
+import warnings
+
 import numpy as np
 import pytest
 
-from pydesim import Trace
+from pydesim import Trace, Statistic
 
 
 #
@@ -52,6 +54,17 @@ def test_trace_creation_raises_error_when_passed_data_with_wrong_shape(data):
     assert 'wrong data shape' in str(excinfo.value).lower()
 
 
+@pytest.mark.parametrize('data, mode', [
+    ([(0, 1), (1, 2), (2, 3)], 'split'),
+    ([(0, 1, 2), (3, 4, 5)], 'samples'),
+])
+def test_trace_creation_in_explicit_mode_raises_error_for_wrong_shape(data,
+                                                                      mode):
+    with pytest.raises(ValueError) as excinfo:
+        Trace(data, mode=mode)
+    assert 'wrong data shape' in str(excinfo.value).lower()
+
+
 @pytest.mark.parametrize('mode,expected', [
     ('split', ((1, 10), (2, 20))),
     ('samples', ((1, 2), (10, 20))),
@@ -221,3 +234,292 @@ def test_asarray_with_illegal_mode_raises_error():
     with pytest.raises(ValueError) as excinfo:
         trace.asarray('wrong mode')
     assert 'invalid mode' in str(excinfo.value).lower()
+
+
+#
+# Test warm-up detection and reset
+#
+@pytest.mark.parametrize('method', ['mser', 'welch'])
+def test_warmup_detects_initial_transient(method):
+    rng = np.random.default_rng(1)
+    times = np.arange(0, 1000, 0.5)
+    values = 10 + rng.normal(0, 1, len(times)) + np.where(
+        times < 100, 50 * (1 - times / 100), 0)
+    trace = Trace([times, values])
+    assert 70 <= trace.warmup(method) <= 200
+
+
+def test_warmup_raises_error_for_too_short_trace():
+    with pytest.raises(ValueError) as excinfo:
+        Trace([(0, 1)]).warmup()
+    assert 'too few samples' in str(excinfo.value).lower()
+
+
+def test_reset_removes_records_or_keeps_last_value():
+    trace = Trace([(0, 1), (2, 5)])
+    trace.reset(3)
+    assert trace.as_tuple() == ((3, 5),)
+    trace.reset()
+    assert trace.empty
+
+
+#
+# Test columnar storage
+#
+def test_asarray_split_is_zero_copy_view():
+    trace = Trace()
+    for t in range(100):
+        trace.record(t, t % 7)
+    first, second = trace.asarray('split'), trace.asarray('split')
+    assert first.shape == (2, 100)
+    assert np.shares_memory(first, second)
+    assert not first.flags.writeable
+    np.testing.assert_array_equal(trace.asarray('samples'), first.T)
+
+
+def test_pmf_arrays_match_pmf():
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.exponential(1.0, 10000))
+    values = rng.integers(0, 5, 10000)
+    trace = Trace([times, values])
+    distinct, probs = trace.pmf_arrays()
+    np.testing.assert_array_equal(distinct, np.arange(5))
+    assert probs.sum() == pytest.approx(1.0)
+    durations = np.diff(times)
+    np.testing.assert_allclose(
+        probs, [durations[values[:-1] == v].sum() / durations.sum()
+                for v in range(5)])
+    assert trace.timeavg() == pytest.approx(
+        np.dot(values[:-1], durations) / durations.sum())
+
+
+#
+# Test resampled and windowed views
+#
+def test_resample_returns_values_on_regular_grid():
+    trace = Trace([(0, 0), (1, 10), (4, 20), (5, 0)])
+    times, values = trace.resample(1)
+    np.testing.assert_array_equal(times, [0, 1, 2, 3, 4, 5])
+    np.testing.assert_array_equal(values, [0, 10, 10, 10, 20, 0])
+
+    times, values = trace.resample(2, start=-1, end=4)
+    np.testing.assert_array_equal(times, [-1, 1, 3])
+    np.testing.assert_array_equal(values, [np.nan, 10, 10])
+
+
+def test_window_timeavg():
+    trace = Trace([(0, 0), (1, 10), (4, 20), (5, 0)])
+    ends, averages = trace.window_timeavg(2.5)
+    np.testing.assert_allclose(ends, [2.5, 5])
+    np.testing.assert_allclose(averages, [6, 14])
+
+    ends, averages = trace.window_timeavg(1, step=0.5)
+    assert len(ends) == 9
+    np.testing.assert_allclose(averages[[0, 3, 7, 8]], [0, 10, 15, 20])
+    with pytest.raises(ValueError):
+        trace.window_timeavg(10)
+
+
+def test_downsample_keeps_minimums_and_maximums():
+    trace = Trace([(0, 0), (1, 10), (4, 20), (5, 0)])
+    starts, minimums, maximums = trace.downsample(2)
+    np.testing.assert_allclose(starts, [0, 2.5])
+    np.testing.assert_array_equal(minimums, [0, 0])
+    np.testing.assert_array_equal(maximums, [10, 20])
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 1, 100001)
+    trace = Trace([np.arange(100001), values])
+    _, minimums, maximums = trace.downsample(100)
+    assert minimums.min() == values.min()
+    assert maximums.max() == values.max()
+    np.testing.assert_array_equal(
+        maximums[:99], values[:99000].reshape(99, 1000).max(axis=1))
+
+
+@pytest.mark.parametrize('size', [1, 2, (1 << 16) + 1, (1 << 16) + 2])
+def test_pmf_of_disk_trace_at_chunk_boundaries(size):
+    values = np.arange(size) % 3
+    memory = Trace([np.arange(size), values], mode='split')
+    disk = Trace([np.arange(size), values], mode='split', storage='disk')
+    assert disk.pmf() == pytest.approx(memory.pmf())
+    assert disk.timeavg() == pytest.approx(memory.timeavg())
+
+
+def test_disk_storage_matches_memory_storage():
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.exponential(1.0, 150000))
+    values = rng.integers(0, 10, 150000)
+    memory, disk = Trace(), Trace(storage='disk')
+    for t, v in zip(times[:1000], values[:1000]):
+        memory.record(t, v)
+        disk.record(t, v)
+    rest = Trace([times[1000:], values[1000:]], storage='disk')
+    disk._data.extend(rest.asarray('split'))
+    memory._data.extend(rest.asarray('split'))
+
+    assert len(disk) == 150000
+    np.testing.assert_array_equal(disk.asarray('split'), [times, values])
+    distinct, probs = disk.pmf_arrays()
+    expected_distinct, expected_probs = memory.pmf_arrays()
+    np.testing.assert_array_equal(distinct, expected_distinct)
+    np.testing.assert_allclose(probs, expected_probs)
+    assert disk.timeavg() == pytest.approx(memory.timeavg())
+    disk.reset(times[-1] + 1)
+    assert disk.as_tuple() == ((times[-1] + 1, values[-1]),)
+
+
+def test_save_and_load(tmp_path):
+    trace = Trace([(0, 1), (2, 3), (5, 0)])
+    trace.save(tmp_path / 'size')
+    loaded = Trace.load(tmp_path / 'size')
+    assert loaded.as_tuple() == trace.as_tuple()
+    assert loaded.timeavg() == trace.timeavg()
+    loaded.record(6, 2)
+    assert len(loaded) == 4
+    with pytest.raises(ValueError) as excinfo:
+        Statistic.load(tmp_path / 'size')
+    assert 'trace saved' in str(excinfo.value).lower()
+
+
+#
+# Test bulk recording
+#
+def test_record_many_appends_arrays():
+    trace = Trace([(0, 1)])
+    trace.record_many(np.array([1, 1, 3]), np.array([2, 3, 4]))
+    trace.record_many([], [])
+    assert trace.as_tuple() == ((0, 1), (1, 2), (1, 3), (3, 4))
+    disk = Trace(storage='disk')
+    disk.record_many([0, 1], [5, 6])
+    assert disk.as_tuple() == ((0, 5), (1, 6))
+
+
+@pytest.mark.parametrize('times, values, error', [
+    ([2, 1], [1, 2], 'adding data in past prohibited'),
+    ([-1, 1], [1, 2], 'adding data in past prohibited'),
+    ([1, 2], [1], 'wrong data shape'),
+    ([[1, 2]], [[1, 2]], 'wrong data shape'),
+])
+def test_record_many_with_invalid_data_raises_error(times, values, error):
+    trace = Trace([(0, 1)])
+    with pytest.raises(ValueError) as excinfo:
+        trace.record_many(times, values)
+    assert error in str(excinfo.value).lower()
+    assert len(trace) == 1
+
+
+def test_record_checks_time_after_restore_and_reset():
+    for trace in (Trace([(0, 1), (5, 2)]),
+                  Trace.from_state(Trace([(0, 1), (5, 2)]).state())):
+        with pytest.raises(ValueError):
+            trace.record(4, 3)
+        trace.record_many([5, 6], [3, 4])
+        with pytest.raises(ValueError):
+            trace.record(5.5, 3)
+        trace.reset(8)
+        with pytest.raises(ValueError):
+            trace.record(7, 3)
+        trace.reset()
+        trace.record(1, 3)
+        assert trace.as_tuple() == ((1, 3),)
+
+
+#
+# Test creation from arrays
+#
+@pytest.mark.parametrize('data, mode', [
+    (np.array([[0, 1, 2], [5, 6, 7]]), 'auto'),
+    (np.array([[0, 5], [1, 6], [2, 7]]), 'auto'),
+    (np.array([[0, 5], [1, 6], [2, 7]]), 'samples'),
+    ((np.arange(3), np.arange(5, 8)), 'auto'),
+    ([np.arange(3), np.arange(5, 8)], 'split'),
+])
+def test_trace_creation_from_arrays(data, mode):
+    trace = Trace(data, mode=mode)
+    assert trace.as_tuple() == ((0, 5), (1, 6), (2, 7))
+
+
+def test_trace_creation_from_arrays_follows_sequence_rules():
+    data = np.array([[1, 2], [10, 20]])
+    assert Trace(data).as_tuple() == Trace(data.tolist()).as_tuple()
+    assert Trace(data, mode='split').as_tuple() == ((1, 10), (2, 20))
+    assert Trace(np.array([])).empty
+
+
+@pytest.mark.parametrize('data', [
+    np.arange(4),
+    np.zeros((3, 3)),
+    np.zeros((2, 2, 2)),
+    (np.arange(3), np.arange(4)),
+])
+def test_trace_creation_from_arrays_with_wrong_shape_raises_error(data):
+    with pytest.raises(ValueError) as excinfo:
+        Trace(data)
+    assert 'wrong data shape' in str(excinfo.value).lower()
+
+
+def test_trace_creation_from_unordered_arrays_raises_error():
+    with pytest.raises(ValueError) as excinfo:
+        Trace((np.array([0, 2, 1]), np.zeros(3)))
+    assert 'data must be ordered by time' in str(excinfo.value).lower()
+    with pytest.raises(ValueError) as excinfo:
+        Trace(np.zeros((3, 2)), mode='split')
+    assert 'wrong data shape' in str(excinfo.value).lower()
+    with pytest.raises(ValueError) as excinfo:
+        Trace(np.zeros((3, 2)), mode='wrong')
+    assert 'invalid mode' in str(excinfo.value).lower()
+
+
+#
+# Test time-weighted distribution
+#
+def test_time_cdf_and_quantiles():
+    trace = Trace([(0, 2), (8, 3), (11, 4), (12, 3), (16, 2)])
+    values, cdf = trace.time_cdf()
+    np.testing.assert_array_equal(values, [2, 3, 4])
+    np.testing.assert_allclose(cdf, [0.5, 0.9375, 1])
+    assert trace.time_quantile(0.5) == 2
+    assert trace.time_quantile(0.6) == 3
+    np.testing.assert_array_equal(trace.time_quantile([0, 0.95, 1]),
+                                  [2, 4, 4])
+    assert trace.fraction_above(2) == pytest.approx(0.5)
+    assert trace.fraction_above(3.5) == pytest.approx(0.0625)
+    assert trace.fraction_above(1) == pytest.approx(1)
+    assert trace.fraction_above(4) == 0
+    with pytest.raises(ValueError):
+        trace.time_quantile(1.5)
+
+
+def test_time_quantile_matches_weighted_samples():
+    rng = np.random.default_rng(10)
+    times = np.arange(0, 100001, dtype=float)
+    values = rng.integers(0, 100, len(times))
+    trace = Trace([times, values])
+    assert trace.time_quantile(0.9) == np.quantile(
+        values[:-1], 0.9, method='inverted_cdf')
+    assert trace.fraction_above(50) == pytest.approx(
+        np.mean(values[:-1] > 50))
+
+
+def test_time_distribution_of_zero_duration_trace_raises_error():
+    with pytest.raises(ValueError) as excinfo:
+        Trace([(1, 2)]).time_cdf()
+    assert 'zero duration' in str(excinfo.value).lower()
+    for method in ('pmf', 'timeavg', 'time_cdf'):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            with pytest.raises(ValueError) as excinfo:
+                getattr(Trace([(1, 2), (1, 3)]), method)()
+        assert 'zero duration' in str(excinfo.value).lower()
+    with pytest.raises(ValueError) as excinfo:
+        Trace().fraction_above(1)
+    assert 'expected non-empty values' in str(excinfo.value).lower()
+
+
+def test_loaded_trace_records_no_values(tmp_path):
+    Trace([(0, 5), (1, 6)]).save(tmp_path / 'queue')
+    trace = Trace.load(tmp_path / 'queue')
+    trace.record_many([], [])
+    trace.record(2, 7)
+    assert trace.as_tuple() == ((0, 5), (1, 6), (2, 7))